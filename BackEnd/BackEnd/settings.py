@@ -128,6 +128,47 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory is per process; switch to FileBasedCache to share catalog
+# cache invalidation between several worker processes on one host.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'marketplace',
+    },
+}
+
+# Upper bound (seconds) for cached catalog responses; writes invalidate them earlier
+CATALOG_CACHE_ALIAS = 'default'
+CATALOG_CACHE_TIMEOUT = 300
+
+# Product views are buffered in memory and flushed with one bulk $inc
+PRODUCT_VIEW_FLUSH_INTERVAL = 5  # seconds
+PRODUCT_VIEW_BUFFER_SIZE = 1000  # distinct products pending before an early flush
+
+# Cache lifetime (seconds) of each /api/home/ section
+HOME_SECTION_TIMEOUTS = {
+    'categories': 300,
+    'stores': 120,
+    'latest': 60,
+    'featured': 600,
+}
+
+# Trending / best-seller rankings: decay half-lives (seconds), materialized list size and
+# how long (seconds) a stored top-K list is served before it is recomputed on read
+RANKING_HALF_LIVES = {
+    'trending': 24 * 3600,
+    'best_sellers': 7 * 24 * 3600,
+}
+RANKING_SIZE = 50
+RANKING_REFRESH_INTERVAL = 300
+
+# Seconds a customer profile resolved for the "me" endpoints is reused across requests
+# (cleared when the profile is saved); 0 disables the shared cache
+USER_CACHE_ALIAS = 'default'
+USER_CACHE_TIMEOUT = 30
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,94 @@
+from datetime import timedelta
+
+from bson.decimal128 import Decimal128
+
+from .models import Product, StoreSalesRollup
+from .mongo import get_collection
+
+
+GRANULARITIES = ('day', 'week', 'month')
+TOP_PRODUCTS_LIMIT = 20
+
+
+def _decimal_str(value):
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    return str(value or 0)
+
+
+def build_store_analytics_pipeline(store_id, start, end, granularity='day'):
+    """
+    Merge the daily rollups of one store in [start, end) into a time series bucketed by
+    granularity, the range totals and the best-selling products - one aggregation.
+    """
+    return [
+        {'$match': {'store_id': store_id, 'day': {'$gte': start, '$lt': end}}},
+        {'$facet': {
+            'series': [
+                {'$group': {
+                    '_id': {'$dateTrunc': {'date': '$day', 'unit': granularity, 'startOfWeek': 'saturday'}},
+                    'quantity': {'$sum': '$quantity'},
+                    'revenue': {'$sum': '$revenue'},
+                    'lines': {'$sum': '$lines'},
+                }},
+                {'$sort': {'_id': 1}},
+            ],
+            'totals': [
+                {'$group': {
+                    '_id': None,
+                    'quantity': {'$sum': '$quantity'},
+                    'revenue': {'$sum': '$revenue'},
+                    'lines': {'$sum': '$lines'},
+                }},
+            ],
+            'products': [
+                {'$group': {
+                    '_id': '$product_id',
+                    'quantity': {'$sum': '$quantity'},
+                    'revenue': {'$sum': '$revenue'},
+                }},
+                {'$sort': {'revenue': -1, '_id': 1}},
+                {'$limit': TOP_PRODUCTS_LIMIT},
+                {'$lookup': {
+                    'from': Product._meta.db_table,
+                    'localField': '_id',
+                    'foreignField': '_id',
+                    'pipeline': [{'$project': {'title': 1}}],
+                    'as': 'product',
+                }},
+            ],
+        }},
+    ]
+
+
+def store_analytics(store_id, start, end, granularity='day'):
+    """Revenue and sales of a store for dates start..end inclusive"""
+    pipeline = build_store_analytics_pipeline(store_id, start, end + timedelta(days=1), granularity)
+    result = next(get_collection(StoreSalesRollup).aggregate(pipeline), {})
+    totals = result['totals'][0] if result.get('totals') else {}
+
+    return {
+        'totals': {
+            'quantity': totals.get('quantity', 0),
+            'revenue': _decimal_str(totals.get('revenue')),
+            'lines': totals.get('lines', 0),
+        },
+        'series': [
+            {
+                'period': doc['_id'].date().isoformat(),
+                'quantity': doc['quantity'],
+                'revenue': _decimal_str(doc['revenue']),
+                'lines': doc['lines'],
+            }
+            for doc in result.get('series', [])
+        ],
+        'top_products': [
+            {
+                'id': str(doc['_id']),
+                'title': doc['product'][0]['title'] if doc['product'] else None,
+                'quantity': doc['quantity'],
+                'revenue': _decimal_str(doc['revenue']),
+            }
+            for doc in result.get('products', [])
+        ],
+    }
@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class MarketplaceConfig(AppConfig):
     default_auto_field = 'django_mongodb_backend.fields.ObjectIdAutoField'
     name = 'marketplace'
+
+    def ready(self):
+        post_migrate.connect(create_search_index, sender=self)
+
+
+def create_search_index(using=None, **kwargs):
+    """Text indexes cannot be declared in model Meta; create the product one after every migrate"""
+    from .search import ensure_product_text_index
+
+    ensure_product_text_index(using=using)
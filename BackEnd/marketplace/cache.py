@@ -0,0 +1,97 @@
+import functools
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+
+# Version scopes shared by all catalog readers
+CATALOG_SCOPE = ('catalog', 'all')
+STORES_SCOPE = ('stores', 'all')
+
+
+def get_catalog_cache():
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+
+def _version_key(scope):
+    return 'catalog:version:%s:%s' % scope
+
+
+def get_versions(scopes):
+    """Return the current version counter of each (scope, value) pair"""
+    cache = get_catalog_cache()
+    keys = [_version_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        version = found.get(key)
+        if version is None:
+            # Seed from the clock so a counter evicted and re-created never
+            # repeats a version that older cached entries were stored under
+            cache.add(key, time.time_ns(), None)
+            version = cache.get(key, 0)
+        versions.append(version)
+    return versions
+
+
+def bump_versions(scopes):
+    """Invalidate every cached response built under any of the given scopes"""
+    cache = get_catalog_cache()
+    for scope in scopes:
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+
+def is_public_request(request):
+    """Anonymous users and customers all see the same catalog data"""
+    user = request.user
+    if not user or not user.is_authenticated:
+        return True
+    return getattr(user, 'user_type', None) == 'customer' and not user.is_superuser
+
+
+def response_cache_key(request, scopes):
+    params = sorted(
+        (key, value)
+        for key in request.query_params
+        for value in request.query_params.getlist(key)
+    )
+    raw = json.dumps(
+        [request.path, params, [list(scope) for scope in scopes], get_versions(scopes)],
+        default=str,
+    )
+    return 'catalog:response:' + hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def cache_catalog_response(get_scopes, public_only=False):
+    """
+    Cache successful GET responses keyed by path, normalized query params and
+    the version counters of the scopes returned by get_scopes(view, kwargs).
+    Writers bump those counters, so entries are invalidated precisely and the
+    timeout is only an upper bound.
+    """
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method != 'GET' or (public_only and not is_public_request(request)):
+                return view_method(self, request, *args, **kwargs)
+
+            cache = get_catalog_cache()
+            key = response_cache_key(request, get_scopes(self, kwargs))
+            data = cache.get(key)
+            if data is not None:
+                return Response(data)
+
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300))
+            return response
+        return wrapper
+    return decorator
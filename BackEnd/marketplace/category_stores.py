@@ -0,0 +1,72 @@
+from .models import CategoryStore, StoreOwner
+from .mongo import get_collection
+
+
+# ?sort= value -> $sort stage (ties broken by store id for stable pages)
+STORE_SORTS = {
+    'products': {'products_count': -1, '_id': 1},
+    'rating': {'rating_average': -1, 'products_count': -1, '_id': 1},
+}
+
+
+def build_stores_by_category_pipeline(category, sort='products', skip=0, limit=20):
+    """
+    Approved stores with active products in a category and their per-store counts:
+    read the materialized CategoryStore rows, one $lookup into the store collection,
+    then a $facet returning the requested page and the total in the same round trip.
+    """
+    return [
+        {'$match': {'category': category, 'active_count': {'$gt': 0}}},
+        {'$project': {'_id': '$store_id', 'products_count': '$active_count'}},
+        {'$lookup': {
+            'from': StoreOwner._meta.db_table,
+            'localField': '_id',
+            # Store owners are a multi-table child: their pk is the parent link column
+            'foreignField': StoreOwner._meta.pk.column,
+            'pipeline': [
+                {'$match': {'seller_status': StoreOwner.SellerStatus.APPROVED}},
+                {'$project': {'store_name': 1, 'store_rating': 1, 'store_logo': 1}},
+            ],
+            'as': 'store',
+        }},
+        {'$unwind': '$store'},
+        {'$project': {
+            'products_count': 1,
+            'store_name': '$store.store_name',
+            'store_rating': '$store.store_rating',
+            'store_logo': '$store.store_logo',
+            # Ratings are stored as {sum, count}; older documents still hold {average, count}
+            'rating_average': {'$cond': [
+                {'$gt': [{'$ifNull': ['$store.store_rating.count', 0]}, 0]},
+                {'$ifNull': [
+                    {'$divide': ['$store.store_rating.sum', '$store.store_rating.count']},
+                    {'$ifNull': ['$store.store_rating.average', 0]},
+                ]},
+                0,
+            ]},
+        }},
+        {'$facet': {
+            'results': [{'$sort': STORE_SORTS[sort]}, {'$skip': skip}, {'$limit': limit}],
+            'total': [{'$count': 'count'}],
+        }},
+    ]
+
+
+def stores_by_category(category, sort='products', skip=0, limit=20):
+    """Return (page of store dicts, total stores) for a category"""
+    pipeline = build_stores_by_category_pipeline(category, sort=sort, skip=skip, limit=limit)
+    result = next(get_collection(CategoryStore).aggregate(pipeline), {})
+    logo_storage = StoreOwner._meta.get_field('store_logo').storage
+
+    stores = [
+        {
+            'id': str(doc['_id']),
+            'store_name': doc.get('store_name'),
+            'store_rating': StoreOwner.rating_summary(doc.get('store_rating')),
+            'store_logo': logo_storage.url(doc['store_logo']) if doc.get('store_logo') else None,
+            'products_count': doc['products_count'],
+        }
+        for doc in result.get('results', [])
+    ]
+    total = result['total'][0]['count'] if result.get('total') else 0
+    return stores, total
@@ -0,0 +1,245 @@
+from decimal import Decimal
+
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from bson.errors import InvalidId
+from django.utils import timezone
+from pymongo import UpdateOne
+
+from .cache import bump_versions
+from .models import Order, OrderItem, Product, StoreOwner, StoreSalesRollup
+from .mongo import get_collection, supports_transactions
+
+
+class CheckoutError(Exception):
+    """Checkout rejected with nothing left written: bad lines, unknown products or not enough stock"""
+
+
+def merge_lines(cart_items):
+    """{product id: quantity} from cart lines, summing repeated products"""
+    lines = {}
+    for item in cart_items:
+        try:
+            product_id = ObjectId(item['product_id'])
+            quantity = int(item.get('quantity', 1))
+        except (InvalidId, TypeError, ValueError, KeyError, AttributeError):
+            raise CheckoutError("آیتم سبد خرید نامعتبر است")
+        if quantity < 1:
+            raise CheckoutError("تعداد باید بزرگ‌تر از صفر باشد")
+        lines[product_id] = lines.get(product_id, 0) + quantity
+    if not lines:
+        raise CheckoutError("آیتم‌های سبد خرید الزامی است")
+    return lines
+
+
+def load_products(lines):
+    """Active products of all lines in one $in query; fails fast on a missing product or short stock"""
+    products = {
+        product.pk: product
+        for product in Product.objects.filter(id__in=list(lines), status=Product.Status.ACTIVE).only(
+            'id', 'title', 'price', 'stock', 'category', 'store_owner'
+        )
+    }
+    for product_id, quantity in lines.items():
+        product = products.get(product_id)
+        if product is None:
+            raise CheckoutError(f"محصول با شناسه {product_id} یافت نشد")
+        if product.stock < quantity:
+            raise CheckoutError(f"محصول {product.title} موجود نیست یا موجودی کافی ندارد")
+    return products
+
+
+def restock(lines, session=None):
+    """Undo decrements that were applied before a later step failed"""
+    if lines:
+        get_collection(Product).bulk_write(
+            [
+                UpdateOne({'_id': product_id}, {'$inc': {'stock': quantity, 'sales_count': -quantity}})
+                for product_id, quantity in lines.items()
+            ],
+            ordered=False,
+            session=session,
+        )
+
+
+def decrement_stock(lines, products, session=None):
+    """
+    Take stock for every line with one guarded update per product (active and stock >=
+    quantity) that also records the sale, stopping at the first line whose guard does not
+    match. Outside a transaction the lines already taken are put back before raising.
+    Decayed ranking scores of rolled-back lines are not reverted.
+    """
+    collection = get_collection(Product)
+    taken = {}
+    try:
+        for product_id, quantity in lines.items():
+            result = collection.update_one(
+                {'_id': product_id, 'status': Product.Status.ACTIVE, 'stock': {'$gte': quantity}},
+                [{'$set': {'stock': {'$subtract': ['$stock', quantity]}, **Product.sale_fields(quantity)}}],
+                session=session,
+            )
+            if result.matched_count == 0:
+                raise CheckoutError(f"محصول {products[product_id].title} موجود نیست یا موجودی کافی ندارد")
+            taken[product_id] = quantity
+    except Exception:
+        if session is None:
+            restock(taken)
+        raise
+
+
+def build_documents(customer, store_id, lines, products, fields, now):
+    """Raw order and order item documents with preassigned ids"""
+    order_id = ObjectId()
+    items = []
+    total_amount = Decimal('0')
+    for product_id, quantity in lines.items():
+        product = products[product_id]
+        total = product.price * quantity
+        total_amount += total
+        items.append({
+            '_id': ObjectId(),
+            'order_id': order_id,
+            'product_id': product_id,
+            'title': product.title,
+            'price': Decimal128(str(product.price)),
+            'quantity': quantity,
+            'total': Decimal128(str(total)),
+        })
+    order = {
+        '_id': order_id,
+        'user_id': customer.pk,
+        'store_id': store_id,
+        'total_amount': Decimal128(str(total_amount)),
+        'shipping_address': fields.get('shipping_address') or {},
+        'status': fields.get('status') or Order.Status.PENDING,
+        'payment_method': fields.get('payment_method') or '',
+        'tracking_number': fields.get('tracking_number'),
+        'created_at': now,
+        'updated_at': now,
+    }
+    return order, items
+
+
+def write_orders(orders, items, lines, products, cart=None, cart_items=None, session=None):
+    """
+    Cart lines, stock, orders, items, store counters and sales rollups: one guarded update
+    per product and a fixed number of round trips for everything else however many stores.
+    Outside a transaction every step that already ran is undone when a later one fails.
+    """
+    if cart is not None and not cart.take_items(cart_items, session=session):
+        raise CheckoutError("سبد خرید در این فاصله تغییر کرده است؛ دوباره تلاش کنید")
+
+    try:
+        decrement_stock(lines, products, session=session)
+    except Exception:
+        if session is None and cart is not None:
+            cart.return_items(cart_items)
+        raise
+
+    try:
+        get_collection(Order).insert_many(orders, ordered=False, session=session)
+        get_collection(OrderItem).insert_many(items, ordered=False, session=session)
+    except Exception:
+        if session is None:
+            order_ids = [order['_id'] for order in orders]
+            get_collection(OrderItem).delete_many({'order_id': {'$in': order_ids}})
+            get_collection(Order).delete_many({'_id': {'$in': order_ids}})
+            restock(lines)
+            if cart is not None:
+                cart.return_items(cart_items)
+        raise
+
+    orders_by_id = {order['_id']: order for order in orders}
+    counters = {}
+    rollups = {}
+    for item in items:
+        order = orders_by_id[item['order_id']]
+        total = item['total'].to_decimal()
+        # One sale per order line, as reconcile_store_stats counts them
+        deltas = counters.setdefault(order['store_id'], {'total_sales': 0, 'total_revenue': Decimal('0')})
+        deltas['total_sales'] += 1
+        deltas['total_revenue'] += total
+        if order['status'] not in Order.UNCOUNTED_STATUSES:
+            key = (order['store_id'], StoreSalesRollup.day_bucket(order['created_at']), item['product_id'])
+            quantity, revenue, count = rollups.get(key, (0, Decimal('0'), 0))
+            rollups[key] = (quantity + item['quantity'], revenue + total, count + 1)
+    StoreOwner.increment_counters_many(counters, session=session)
+    StoreSalesRollup.increment(rollups, session=session)
+
+
+def place_orders(customer, cart_items, cart=None, single_store=False, **fields):
+    """
+    Create one order per store from cart lines [{product_id, quantity}]: one $in read, one
+    guarded stock decrement per product, one insert for all orders and one for all of their items,
+    one bulk update of the store counters. With `cart`, the same lines are removed from it
+    atomically as part of the checkout; `single_store` rejects lines from several stores.
+    Runs in a transaction when the deployment supports one, otherwise undoes its own writes
+    when a later step fails. Raises CheckoutError.
+    """
+    lines = merge_lines(cart_items)
+    products = load_products(lines)
+
+    by_store = {}
+    for product_id, quantity in lines.items():
+        by_store.setdefault(products[product_id].store_owner_id, {})[product_id] = quantity
+    if single_store and len(by_store) > 1:
+        raise CheckoutError("تمام محصولات باید از یک فروشگاه باشند")
+
+    now = timezone.now()
+    orders = []
+    items = []
+    for store_id, store_lines in by_store.items():
+        order, order_items = build_documents(customer, store_id, store_lines, products, fields, now)
+        orders.append(order)
+        items.extend(order_items)
+
+    def write(session=None):
+        write_orders(orders, items, lines, products, cart=cart, cart_items=cart_items, session=session)
+
+    collection = get_collection(Order)
+    if supports_transactions(collection):
+        with collection.database.client.start_session() as session:
+            session.with_transaction(write)
+    else:
+        write()
+
+    bump_versions({scope for product in products.values() for scope in product.get_cache_scopes()})
+    return [order_instance(order, customer) for order in orders]
+
+
+def place_order(customer, cart_items, **fields):
+    """Single-store order from cart lines; see place_orders"""
+    return place_orders(customer, cart_items, single_store=True, **fields)[0]
+
+
+def checkout_cart(customer, cart, product_ids=None, **fields):
+    """
+    Check out a customer's cart (or just the lines of `product_ids`), one order per store,
+    removing the purchased lines from the cart in the same operation
+    """
+    cart_items = [
+        item for item in cart.items
+        if product_ids is None or item.get('product_id') in product_ids
+    ]
+    if not cart_items:
+        raise CheckoutError("سبد خرید خالی است")
+    return place_orders(customer, cart_items, cart=cart, **fields)
+
+
+def order_instance(order, customer):
+    """Order model instance for a document just written, without reading it back"""
+    instance = Order(
+        id=order['_id'],
+        user=customer,
+        store_id=order['store_id'],
+        total_amount=order['total_amount'].to_decimal(),
+        shipping_address=order['shipping_address'],
+        status=order['status'],
+        payment_method=order['payment_method'],
+        tracking_number=order['tracking_number'],
+        created_at=order['created_at'],
+        updated_at=order['updated_at'],
+    )
+    instance._state.adding = False
+    instance._loaded_status = instance.status
+    return instance
@@ -0,0 +1,46 @@
+import functools
+import hashlib
+import json
+
+from django.core.exceptions import ValidationError
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def weak_etag(*parts):
+    """Weak validator hashed from the given values"""
+    raw = json.dumps(parts, default=str, sort_keys=True)
+    return 'W/"%s"' % hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def first_or_none(queryset):
+    """Single projected row, or None when the lookup is malformed or matches nothing"""
+    try:
+        return queryset.first()
+    except (TypeError, ValueError, ValidationError):
+        return None
+
+
+def conditional_retrieve(view_method):
+    """
+    Answer If-None-Match / If-Modified-Since before the object is loaded and serialized.
+    The view's get_conditional_validators(request, kwargs) returns (etag, last_modified)
+    from a small projection read, or None to fall through to the normal handler.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        validators = self.get_conditional_validators(request, kwargs)
+        if validators is None:
+            return view_method(self, request, *args, **kwargs)
+
+        etag, last_modified = validators
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = view_method(self, request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+        return response
+    return wrapper
@@ -0,0 +1,111 @@
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from pymongo import UpdateOne
+
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounterBuffer:
+    """
+    Write-behind buffer for product view counts.
+    Increments are aggregated in memory per product and flushed as a single
+    bulk_write (views plus the decayed trending score) by a background thread, either
+    every `interval` seconds or as soon as `max_size` distinct products are pending, and
+    once more at shutdown. Requests never write: at `max_size` products further views of
+    products not already pending are dropped until a flush succeeds, and after a failed
+    flush the thread waits `interval` before retrying.
+    """
+
+    def __init__(self, interval=5.0, max_size=1000):
+        self.interval = interval
+        self.max_size = max_size
+        self._pending = Counter()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._retry_at = 0.0
+        self.dropped = 0
+
+    def add(self, product_id, amount=1):
+        """Record views for a product and return the count still pending for it"""
+        with self._lock:
+            if product_id in self._pending or len(self._pending) < self.max_size:
+                self._pending[product_id] += amount
+            else:
+                self.dropped += amount
+            pending = self._pending.get(product_id, 0)
+            full = len(self._pending) >= self.max_size
+        self._ensure_started()
+        if full and time.monotonic() >= self._retry_at:
+            self._wakeup.set()
+        return pending
+
+    def pending(self, product_id):
+        with self._lock:
+            return self._pending.get(product_id, 0)
+
+    def flush(self):
+        """Write every pending increment in one bulk write; returns the number of products updated"""
+        from . import decay
+        from .models import Product
+        from .mongo import get_collection
+
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, Counter()
+            if not batch:
+                return 0
+            try:
+                weight = decay.trending_weight('view')
+                get_collection(Product).bulk_write(
+                    [
+                        UpdateOne({'_id': pk}, [{'$set': {
+                            'views': {'$add': [{'$ifNull': ['$views', 0]}, amount]},
+                            'trending_score': decay.add_expression(
+                                'trending_score', decay.log_score('trending', weight * amount)
+                            ),
+                        }}])
+                        for pk, amount in batch.items()
+                    ],
+                    ordered=False,
+                )
+            except Exception:
+                # Put the increments back so the next flush retries them, within max_size
+                with self._lock:
+                    merged = batch + self._pending
+                    kept = dict(list(merged.items())[:self.max_size])
+                    self.dropped += sum(merged.values()) - sum(kept.values())
+                    self._pending = Counter(kept)
+                self._retry_at = time.monotonic() + self.interval
+                logger.exception('Failed to flush %d product view counters', len(batch))
+                return 0
+            return len(batch)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='view-counter-flush', daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+product_views = ViewCounterBuffer(
+    interval=getattr(settings, 'PRODUCT_VIEW_FLUSH_INTERVAL', 5.0),
+    max_size=getattr(settings, 'PRODUCT_VIEW_BUFFER_SIZE', 1000),
+)
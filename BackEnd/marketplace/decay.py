@@ -0,0 +1,61 @@
+import math
+from datetime import datetime, timezone
+
+from django.conf import settings
+
+
+# Scores are stored as log2(sum of weight * 2^((t - EPOCH) / half_life)) over all events. An event
+# never needs to be decayed again after it is written: ordering by the stored value is the same as
+# ordering by the decayed score at any moment, and the log keeps the number far from float overflow.
+EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+DEFAULT_HALF_LIVES = {
+    'trending': 24 * 3600,          # one day
+    'best_sellers': 7 * 24 * 3600,  # one week
+}
+
+# Event weights of the trending score; best sellers count units sold only
+DEFAULT_TRENDING_WEIGHTS = {
+    'view': 1.0,
+    'sale': 10.0,
+    'rating': 5.0,
+}
+
+
+def half_life(kind):
+    """Half-life in seconds of a ranking kind"""
+    return {**DEFAULT_HALF_LIVES, **getattr(settings, 'RANKING_HALF_LIVES', {})}[kind]
+
+
+def trending_weight(event):
+    return {**DEFAULT_TRENDING_WEIGHTS, **getattr(settings, 'TRENDING_WEIGHTS', {})}[event]
+
+
+def log_score(kind, weight, at=None):
+    """Stored (log2) contribution of an event of the given weight at time `at`"""
+    at = at or datetime.now(timezone.utc)
+    return math.log2(weight) + (at - EPOCH).total_seconds() / half_life(kind)
+
+
+def current_score(kind, stored, at=None):
+    """Decayed score as of `at` from a stored log2 value"""
+    if stored is None:
+        return 0.0
+    at = at or datetime.now(timezone.utc)
+    exponent = stored - (at - EPOCH).total_seconds() / half_life(kind)
+    return 2 ** exponent if exponent > -1000 else 0.0
+
+
+def add_expression(field, value):
+    """
+    Aggregation expression for log2(2^field + 2^value): adds one event's contribution to a
+    stored score inside an update pipeline, so concurrent events stay atomic per document
+    """
+    current = f'${field}'
+    high = {'$max': [current, value]}
+    low = {'$min': [current, value]}
+    return {'$cond': [
+        {'$eq': [{'$ifNull': [current, None]}, None]},
+        value,
+        {'$add': [high, {'$log': [{'$add': [1, {'$pow': [2, {'$subtract': [low, high]}]}]}, 2]}]},
+    ]}
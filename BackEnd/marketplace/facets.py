@@ -0,0 +1,152 @@
+from decimal import Decimal, InvalidOperation
+
+from bson.decimal128 import Decimal128
+
+from .models import Product
+from .mongo import get_collection
+
+
+# Array attributes counted value by value
+ARRAY_FACETS = ('sizes', 'colors', 'tags')
+MAX_FACET_VALUES = 50
+
+# Facet -> field of the $match condition it filters on
+FACET_FIELDS = {
+    'category': 'category',
+    'price': 'price',
+    'in_stock': 'stock',
+    **{field: field for field in ARRAY_FACETS},
+}
+
+
+class FacetFilterError(ValueError):
+    pass
+
+
+def _split(value):
+    return [item.strip() for item in value.split(',') if item.strip()] if value else []
+
+
+def _decimal(value, name):
+    try:
+        return Decimal128(Decimal(value))
+    except (InvalidOperation, ValueError):
+        raise FacetFilterError(f'{name} must be a number')
+
+
+def build_facet_match(params):
+    """Translate query params into the $match conditions of the page (facets drop their own)"""
+    match = {'status': Product.Status.ACTIVE}
+
+    categories = _split(params.get('category'))
+    invalid = [c for c in categories if c not in Product.Category.values]
+    if invalid:
+        raise FacetFilterError(f'Invalid category. Valid categories: {", ".join(Product.Category.values)}')
+    if categories:
+        match['category'] = {'$in': categories}
+
+    for field in ARRAY_FACETS:
+        values = _split(params.get(field))
+        if values:
+            match[field] = {'$in': values}
+
+    price = {}
+    if params.get('min_price'):
+        price['$gte'] = _decimal(params['min_price'], 'min_price')
+    if params.get('max_price'):
+        price['$lte'] = _decimal(params['max_price'], 'max_price')
+    if price:
+        match['price'] = price
+
+    in_stock = params.get('in_stock')
+    if in_stock in ('true', '1'):
+        match['stock'] = {'$gt': 0}
+    elif in_stock in ('false', '0'):
+        match['stock'] = 0
+
+    return match
+
+
+def build_facet_pipeline(match, skip=0, limit=20):
+    """
+    One $facet aggregation returning a page of ids and every facet count. Counts are
+    disjunctive: each facet is counted under every filter but its own, so a selected
+    category (or size, price range...) still shows the counts of its alternatives.
+    """
+    def without(facet):
+        return {key: value for key, value in match.items() if key != FACET_FIELDS[facet]}
+
+    # A document failing two or more filters is in no branch; the outer $match drops those
+    # and keeps the index-backed status condition shared by all of them
+    filtered = [facet for facet, field in FACET_FIELDS.items() if field in match]
+    if len(filtered) > 1:
+        shared = {key: value for key, value in match.items() if key not in FACET_FIELDS.values()}
+        outer = {**shared, '$or': [
+            {key: value for key, value in without(facet).items() if key not in shared}
+            for facet in filtered
+        ]}
+    else:
+        outer = without(filtered[0]) if filtered else match
+
+    def narrow(condition):
+        return [] if condition == outer else [{'$match': condition}]
+
+    counts = {
+        'category': [
+            {'$group': {'_id': '$category', 'count': {'$sum': 1}}},
+            {'$sort': {'count': -1, '_id': 1}},
+        ],
+        'price': [
+            {'$group': {'_id': None, 'min': {'$min': '$price'}, 'max': {'$max': '$price'}}},
+        ],
+        'in_stock': [
+            {'$group': {'_id': {'$gt': ['$stock', 0]}, 'count': {'$sum': 1}}},
+        ],
+    }
+    for field in ARRAY_FACETS:
+        counts[field] = [
+            {'$unwind': f'${field}'},
+            {'$group': {'_id': f'${field}', 'count': {'$sum': 1}}},
+            {'$sort': {'count': -1, '_id': 1}},
+            {'$limit': MAX_FACET_VALUES},
+        ]
+
+    facets = {
+        'results': [
+            *narrow(match),
+            {'$sort': {'created_at': -1, '_id': -1}},
+            {'$skip': skip},
+            {'$limit': limit},
+            {'$project': {'_id': 1}},
+        ],
+        'total': [*narrow(match), {'$count': 'count'}],
+    }
+    for facet, stages in counts.items():
+        facets[facet] = [*narrow(without(facet)), *stages]
+    return [{'$match': outer}, {'$facet': facets}]
+
+
+def _price_value(value):
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    return str(value) if value is not None else None
+
+
+def run_facet_query(params, skip=0, limit=20):
+    """Return (page ids, total, facet counts) for the given filters"""
+    pipeline = build_facet_pipeline(build_facet_match(params), skip=skip, limit=limit)
+    result = next(get_collection(Product).aggregate(pipeline), {})
+
+    ids = [doc['_id'] for doc in result.get('results', [])]
+    total = result['total'][0]['count'] if result.get('total') else 0
+    price = result['price'][0] if result.get('price') else {}
+    in_stock = {doc['_id']: doc['count'] for doc in result.get('in_stock', [])}
+
+    facets = {
+        'category': [{'value': doc['_id'], 'count': doc['count']} for doc in result.get('category', [])],
+        'price': {'min': _price_value(price.get('min')), 'max': _price_value(price.get('max'))},
+        'in_stock': {'true': in_stock.get(True, 0), 'false': in_stock.get(False, 0)},
+    }
+    for field in ARRAY_FACETS:
+        facets[field] = [{'value': doc['_id'], 'count': doc['count']} for doc in result.get(field, [])]
+    return ids, total, facets
@@ -0,0 +1,118 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .cache import CATALOG_SCOPE, STORES_SCOPE, get_catalog_cache, get_versions
+from .category_stores import stores_by_category
+from .models import CategoryStore, Product
+from .mongo import get_collection
+from .serializers import ProductCardSerializer
+
+
+logger = logging.getLogger(__name__)
+
+LATEST_PRODUCTS_LIMIT = 12
+FEATURED_PRODUCTS_LIMIT = 8
+STORES_PER_CATEGORY = 8
+
+# Sections run concurrently under WSGI; worker threads keep their database connections open
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='home-section')
+
+
+def build_categories():
+    """Every category with its number of active products"""
+    counts = {
+        doc['_id']: doc['count']
+        for doc in get_collection(CategoryStore).aggregate([
+            {'$group': {'_id': '$category', 'count': {'$sum': '$active_count'}}},
+        ])
+    }
+    return [
+        {'value': value, 'label': label, 'active_products': counts.get(value, 0)}
+        for value, label in Product.Category.choices
+    ]
+
+
+def build_stores():
+    """Top stores of each category by active product count"""
+    return {
+        category: stores_by_category(category, limit=STORES_PER_CATEGORY)[0]
+        for category in Product.Category.values
+    }
+
+
+def build_latest():
+    products = Product.objects.filter(status=Product.Status.ACTIVE).order_by('-created_at', '-id').only(
+        'id', 'card', 'created_at'
+    )[:LATEST_PRODUCTS_LIMIT]
+    return ProductCardSerializer(products, many=True).data
+
+
+def build_featured():
+    """
+    In-stock active products with an image, scored on rating (weighted by how many
+    ratings back it) and sales so a single lucky 5-star rating does not dominate
+    """
+    pipeline = [
+        {'$match': {
+            'status': Product.Status.ACTIVE,
+            'stock': {'$gt': 0},
+            'card.primary_image': {'$ne': None},
+        }},
+        {'$project': {
+            'card': 1,
+            'score': {'$add': [
+                {'$multiply': [
+                    {'$ifNull': ['$rating.average', 0]},
+                    {'$ln': {'$add': [1, {'$ifNull': ['$rating.count', 0]}]}},
+                ]},
+                {'$ln': {'$add': [1, {'$ifNull': ['$sales_count', 0]}]}},
+            ]},
+        }},
+        {'$sort': {'score': -1, '_id': -1}},
+        {'$limit': FEATURED_PRODUCTS_LIMIT},
+    ]
+    products = [
+        Product(id=doc['_id'], card=doc.get('card') or {})
+        for doc in get_collection(Product).aggregate(pipeline)
+    ]
+    return ProductCardSerializer(products, many=True).data
+
+
+# Section name -> (builder, version scopes that invalidate it)
+HOME_SECTIONS = {
+    'categories': (build_categories, [CATALOG_SCOPE]),
+    'stores': (build_stores, [CATALOG_SCOPE, STORES_SCOPE]),
+    'latest': (build_latest, [CATALOG_SCOPE]),
+    'featured': (build_featured, [CATALOG_SCOPE, STORES_SCOPE]),
+}
+
+
+def get_section(name):
+    """One home section from cache, rebuilt when its versions change or its TTL runs out"""
+    build, scopes = HOME_SECTIONS[name]
+    # Per-section TTLs come from settings; a section left out falls back to the catalog TTL
+    timeout = getattr(settings, 'HOME_SECTION_TIMEOUTS', {}).get(
+        name, getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300)
+    )
+    cache = get_catalog_cache()
+    key = 'home:section:%s:%s' % (name, ':'.join(str(version) for version in get_versions(scopes)))
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, timeout)
+    return data
+
+
+def build_home():
+    """Compute all home sections in parallel; a section that fails is returned as None"""
+    futures = {name: _executor.submit(get_section, name) for name in HOME_SECTIONS}
+    sections = {}
+    for name, future in futures.items():
+        try:
+            sections[name] = future.result()
+        except Exception:
+            logger.exception('Failed to build home section %s', name)
+            sections[name] = None
+    return sections
@@ -0,0 +1,86 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from marketplace.models import Order, OrderItem, StoreSalesRollup
+from marketplace.mongo import get_collection
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the store x day x product sales rollups from historical orders. "
+        "Existing rollups are cleared first; run it while orders are not being placed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument("--workers", type=int, default=4)
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        workers = max(options["workers"], 1)
+
+        get_collection(StoreSalesRollup).delete_many({})
+
+        def chunks():
+            chunk = []
+            cursor = get_collection(Order).find(
+                {"status": {"$nin": list(Order.UNCOUNTED_STATUSES)}}, {"_id": 1}
+            ).sort("_id", 1).batch_size(chunk_size)
+            for doc in cursor:
+                chunk.append(doc["_id"])
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+
+        orders = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Keep at most `workers` chunks in flight so memory stays bounded
+            pending = []
+            for chunk in chunks():
+                pending.append(executor.submit(self.backfill_chunk, chunk))
+                orders += len(chunk)
+                if len(pending) >= workers:
+                    pending.pop(0).result()
+            for future in pending:
+                future.result()
+
+        self.stdout.write(self.style.SUCCESS(f"Sales rollups rebuilt from {orders} orders"))
+
+    def backfill_chunk(self, order_ids):
+        """Aggregate one chunk of orders per (store, day, product) and $inc the rollups"""
+        try:
+            pipeline = [
+                {"$match": {"_id": {"$in": order_ids}}},
+                {"$lookup": {
+                    "from": OrderItem._meta.db_table,
+                    "localField": "_id",
+                    "foreignField": "order_id",
+                    "pipeline": [{"$project": {"product_id": 1, "quantity": 1, "total": 1}}],
+                    "as": "items",
+                }},
+                {"$unwind": "$items"},
+                {"$group": {
+                    "_id": {
+                        "store_id": "$store_id",
+                        "day": {"$dateTrunc": {"date": "$created_at", "unit": "day", "timezone": "UTC"}},
+                        "product_id": "$items.product_id",
+                    },
+                    "quantity": {"$sum": "$items.quantity"},
+                    "revenue": {"$sum": "$items.total"},
+                    "lines": {"$sum": 1},
+                }},
+            ]
+            rows = {
+                (doc["_id"]["store_id"], doc["_id"]["day"], doc["_id"]["product_id"]):
+                    (doc["quantity"], doc["revenue"].to_decimal(), doc["lines"])
+                for doc in get_collection(Order).aggregate(pipeline)
+            }
+            # Chunks can share a (store, day, product) row, so they add rather than overwrite
+            StoreSalesRollup.increment(rows)
+        finally:
+            # Worker threads open their own connections
+            connections.close_all()
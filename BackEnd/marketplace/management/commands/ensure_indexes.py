@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from marketplace.search import ensure_product_text_index
+
+
+class Command(BaseCommand):
+    help = "Create MongoDB indexes that cannot be declared in model Meta (text indexes)"
+
+    def handle(self, *args, **options):
+        name = ensure_product_text_index()
+        self.stdout.write(self.style.SUCCESS(f"Ensured index {name}"))
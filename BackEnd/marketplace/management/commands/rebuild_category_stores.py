@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne
+
+from marketplace.cache import STORES_SCOPE, bump_versions
+from marketplace.models import CategoryStore, Product
+from marketplace.mongo import get_collection
+
+
+class Command(BaseCommand):
+    help = "Recompute the category -> store active product counts from the products"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        pipeline = [
+            {"$match": {"status": Product.Status.ACTIVE}},
+            {"$group": {
+                "_id": {"category": "$category", "store_id": "$store_owner_id"},
+                "active_count": {"$sum": 1},
+            }},
+        ]
+        counts = {
+            (doc["_id"]["category"], doc["_id"]["store_id"]): doc["active_count"]
+            for doc in get_collection(Product).aggregate(pipeline, allowDiskUse=True)
+        }
+
+        collection = get_collection(CategoryStore)
+        stale = [
+            doc["_id"]
+            for doc in collection.find({}, {"category": 1, "store_id": 1})
+            if (doc["category"], doc["store_id"]) not in counts
+        ]
+        operations = [
+            UpdateOne(
+                {"category": category, "store_id": store_id},
+                {"$set": {"active_count": active_count}},
+                upsert=True,
+            )
+            for (category, store_id), active_count in counts.items()
+        ]
+        for start in range(0, len(operations), batch_size):
+            collection.bulk_write(operations[start:start + batch_size], ordered=False)
+        if stale:
+            collection.delete_many({"_id": {"$in": stale}})
+
+        bump_versions([STORES_SCOPE])
+        self.stdout.write(self.style.SUCCESS(
+            f"Category stores rebuilt: {len(operations)} rows, {len(stale)} stale rows removed"
+        ))
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne
+
+from marketplace.models import Product, StoreOwner
+from marketplace.mongo import get_collection
+from marketplace.normalization import normalize_text
+
+
+class Command(BaseCommand):
+    help = "Recompute the normalized shadow fields of products and store owners"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        def product_update(product):
+            product.normalize_fields()
+            return UpdateOne({"_id": product.pk}, {"$set": {
+                field: getattr(product, field) for field in Product.NORMALIZED_FIELDS.values()
+            }})
+
+        def store_update(store):
+            # Multi-table child: the pk lives in the parent link column, not the document _id
+            return UpdateOne({StoreOwner._meta.pk.column: store.pk}, {"$set": {
+                "store_name_normalized": normalize_text(store.store_name),
+            }})
+
+        products = Product.objects.only("id", *Product.NORMALIZED_FIELDS).order_by("id")
+        stores = StoreOwner.objects.only("id", "store_name").order_by("id")
+
+        for model, queryset, build in ((Product, products, product_update), (StoreOwner, stores, store_update)):
+            collection = get_collection(model)
+            operations = []
+            updated = 0
+            for obj in queryset.iterator(chunk_size=batch_size):
+                operations.append(build(obj))
+                if len(operations) >= batch_size:
+                    collection.bulk_write(operations, ordered=False)
+                    updated += len(operations)
+                    operations = []
+            if operations:
+                collection.bulk_write(operations, ordered=False)
+                updated += len(operations)
+            self.stdout.write(f"{model._meta.verbose_name_plural}: {updated} updated")
+
+        self.stdout.write(self.style.SUCCESS("Normalized fields rebuilt"))
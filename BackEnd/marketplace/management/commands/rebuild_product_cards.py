@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne
+
+from marketplace.models import Product
+from marketplace.mongo import get_collection
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized card snapshot of every product"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        collection = get_collection(Product)
+        queryset = Product.objects.order_by("id").with_listing_relations()
+
+        operations = []
+        updated = 0
+        for product in queryset.iterator(chunk_size=batch_size):
+            images = product.images.all()
+            card = product.build_card(
+                primary_image=images[0].image.url if images else None,
+                images_count=len(images),
+                store_name=product.store_owner.store_name,
+            )
+            operations.append(UpdateOne({"_id": product.pk}, {"$set": {"card": card}}))
+            if len(operations) >= batch_size:
+                collection.bulk_write(operations, ordered=False)
+                updated += len(operations)
+                operations = []
+
+        if operations:
+            collection.bulk_write(operations, ordered=False)
+            updated += len(operations)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt cards for {updated} products"))
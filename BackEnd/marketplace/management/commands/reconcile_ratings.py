@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne
+
+from marketplace.cache import CATALOG_SCOPE, bump_versions
+from marketplace.models import Product, ProductRating
+from marketplace.mongo import get_collection
+
+
+class Command(BaseCommand):
+    help = "Rebuild every product's rating sum, count, average and histogram from the individual ratings"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        value = {"$toDouble": "$rating"}
+        pipeline = [
+            # Same half-up star bucketing as Product.rating_star
+            {"$group": {
+                "_id": {"product": "$product_id", "star": {"$floor": {"$add": [value, 0.5]}}},
+                "count": {"$sum": 1},
+                "sum": {"$sum": value},
+            }},
+            {"$group": {
+                "_id": "$_id.product",
+                "count": {"$sum": "$count"},
+                "sum": {"$sum": "$sum"},
+                "stars": {"$push": {"star": "$_id.star", "count": "$count"}},
+            }},
+        ]
+        aggregates = {}
+        for doc in get_collection(ProductRating).aggregate(pipeline, allowDiskUse=True):
+            histogram = {}
+            for bucket in doc["stars"]:
+                star = str(Product.rating_star(bucket["star"]))
+                histogram[star] = histogram.get(star, 0) + bucket["count"]
+            aggregates[doc["_id"]] = Product.build_rating_aggregate(doc["sum"], doc["count"], histogram)
+
+        empty = Product.build_rating_aggregate(0, 0, {})
+        collection = get_collection(Product)
+        operations = []
+        updated = 0
+        changed = []
+        for doc in collection.find({}, {"rating": 1, "card.rating": 1}).sort("_id", 1).batch_size(batch_size):
+            rating = aggregates.get(doc["_id"], empty)
+            card_rating = {"average": rating["average"], "count": rating["count"]}
+            if doc.get("rating") == rating and (doc.get("card") or {}).get("rating") == card_rating:
+                continue
+            changed.append(("product", str(doc["_id"])))
+            operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"rating": rating, "card.rating": card_rating}}))
+            if len(operations) >= batch_size:
+                collection.bulk_write(operations, ordered=False)
+                updated += len(operations)
+                operations = []
+        if operations:
+            collection.bulk_write(operations, ordered=False)
+            updated += len(operations)
+
+        if updated:
+            bump_versions([CATALOG_SCOPE, *changed])
+        self.stdout.write(self.style.SUCCESS(f"Ratings reconciled: {updated} products updated"))
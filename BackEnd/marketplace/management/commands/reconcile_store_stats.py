@@ -0,0 +1,95 @@
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from bson.decimal128 import Decimal128
+from django.core.management.base import BaseCommand
+from django.db import connections
+from pymongo import UpdateOne
+
+from marketplace.cache import STORES_SCOPE, bump_versions
+from marketplace.models import Order, OrderItem, Product, StoreOwner
+from marketplace.mongo import get_collection
+
+
+class Command(BaseCommand):
+    help = "Rebuild active_products_count, total_sales and total_revenue of every store from products and orders"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500)
+        parser.add_argument("--workers", type=int, default=4)
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        workers = max(options["workers"], 1)
+
+        # Store owners are a multi-table child of BaseUser: their pk lives in the parent link
+        # column, not in the child document's own _id
+        pk_column = StoreOwner._meta.pk.column
+
+        def chunks():
+            chunk = []
+            for doc in get_collection(StoreOwner).find({}, {pk_column: 1}).sort(pk_column, 1).batch_size(chunk_size):
+                chunk.append(doc[pk_column])
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+
+        updated = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Keep at most `workers` chunks in flight so memory stays bounded
+            pending = []
+            for chunk in chunks():
+                pending.append(executor.submit(self.reconcile_chunk, chunk))
+                if len(pending) >= workers:
+                    updated += pending.pop(0).result()
+            for future in pending:
+                updated += future.result()
+
+        bump_versions([STORES_SCOPE])
+        self.stdout.write(self.style.SUCCESS(f"Store statistics reconciled for {updated} stores"))
+
+    def reconcile_chunk(self, store_ids):
+        """Recompute the counters of one chunk of stores with two aggregations and one bulk write"""
+        try:
+            active = {
+                doc["_id"]: doc["count"]
+                for doc in get_collection(Product).aggregate([
+                    {"$match": {"store_owner_id": {"$in": store_ids}, "status": Product.Status.ACTIVE}},
+                    {"$group": {"_id": "$store_owner_id", "count": {"$sum": 1}}},
+                ])
+            }
+            # One sale per order line, as StoreOwner.increment_sales counts them
+            sales = {
+                doc["_id"]: doc
+                for doc in get_collection(Order).aggregate([
+                    {"$match": {"store_id": {"$in": store_ids}}},
+                    {"$lookup": {
+                        "from": OrderItem._meta.db_table,
+                        "localField": "_id",
+                        "foreignField": "order_id",
+                        "pipeline": [{"$project": {"total": 1}}],
+                        "as": "items",
+                    }},
+                    {"$group": {
+                        "_id": "$store_id",
+                        "total_sales": {"$sum": {"$size": "$items"}},
+                        "total_revenue": {"$sum": {"$sum": "$items.total"}},
+                    }},
+                ])
+            }
+
+            operations = []
+            for store_id in store_ids:
+                totals = sales.get(store_id, {})
+                operations.append(UpdateOne({StoreOwner._meta.pk.column: store_id}, {"$set": {
+                    "active_products_count": active.get(store_id, 0),
+                    "total_sales": totals.get("total_sales", 0),
+                    "total_revenue": totals.get("total_revenue") or Decimal128(Decimal("0")),
+                }}))
+            get_collection(StoreOwner).bulk_write(operations, ordered=False)
+            return len(operations)
+        finally:
+            # Worker threads open their own connections
+            connections.close_all()
@@ -0,0 +1,42 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from marketplace.models import CategoryStore, Product, ProductRanking
+from marketplace.mongo import get_collection
+
+
+class Command(BaseCommand):
+    help = "Recompute the materialized trending and best-seller lists of every scope (all, category, store)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4)
+
+    def handle(self, *args, **options):
+        workers = max(options["workers"], 1)
+
+        scopes = [{}]
+        scopes += [{"category": category} for category in Product.Category.values]
+        store_ids = get_collection(CategoryStore).distinct("store_id", {"active_count": {"$gt": 0}})
+        scopes += [{"store_id": store_id} for store_id in store_ids]
+        jobs = [(kind, scope) for kind in ProductRanking.Kind.values for scope in scopes]
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Keep at most `workers` lists in flight
+            pending = []
+            for kind, scope in jobs:
+                pending.append(executor.submit(self.refresh, kind, scope))
+                if len(pending) >= workers:
+                    pending.pop(0).result()
+            for future in pending:
+                future.result()
+
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {len(jobs)} ranking lists"))
+
+    def refresh(self, kind, scope):
+        try:
+            ProductRanking.compute(kind, **scope)
+        finally:
+            # Worker threads open their own connections
+            connections.close_all()
@@ -1,10 +1,23 @@
+from django.conf import settings
 from django.db import models
 from django_mongodb_backend.fields import ObjectIdAutoField
 from django.contrib.auth.base_user import AbstractBaseUser, BaseUserManager
 from django.contrib.auth.models import PermissionsMixin
 from django.core.validators import RegexValidator, MinLengthValidator, MaxLengthValidator, MinValueValidator, MaxValueValidator
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+import math
+
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from bson.errors import InvalidId
+from pymongo import ReturnDocument, UpdateOne
+
+from . import decay
+from .cache import CATALOG_SCOPE, STORES_SCOPE, bump_versions
+from .mongo import get_collection
+from .normalization import normalize_sku, normalize_text
 
 
 phone_validator = RegexValidator(
@@ -166,6 +179,19 @@ class BaseUser(AbstractBaseUser, PermissionsMixin):
             self.save(update_fields=["image"])
         return self
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Profiles may be cached across requests by the user resolver
+        from .users import invalidate_user
+        invalidate_user(self.pk)
+
+    def delete(self, *args, **kwargs):
+        from .users import invalidate_user
+        user_id = self.pk
+        result = super().delete(*args, **kwargs)
+        invalidate_user(user_id)
+        return result
+
     def __str__(self):
         return self.full_name or self.phone
 
@@ -243,6 +269,13 @@ class StoreOwner(BaseUser):
         error_messages={'unique': 'این ایمیل قبلاً استفاده شده است'},
 
     )
+    store_name_normalized = models.CharField(
+        max_length=255,
+        blank=True,
+        default="",
+        editable=False,
+        help_text="نام فروشگاه نرمال‌شده برای جستجو"
+    )
     
     # Seller Information (Optional)
     seller_address = models.TextField(
@@ -279,7 +312,7 @@ class StoreOwner(BaseUser):
     seller_rating = models.JSONField(
         default=dict,
         blank=True,
-        help_text="امتیاز فروشنده (average, count)"
+        help_text="امتیاز فروشنده (sum, count)"
     )
     
     # Store Logo Image (separate from profile image)
@@ -337,7 +370,7 @@ class StoreOwner(BaseUser):
     store_rating = models.JSONField(
         default=dict,
         blank=True,
-        help_text="امتیاز فروشگاه (average, count)"
+        help_text="امتیاز فروشگاه (sum, count)"
     )
     
     # Statistics
@@ -368,6 +401,7 @@ class StoreOwner(BaseUser):
     class Meta:
         indexes = [
             models.Index(fields=["store_name"]),
+            models.Index(fields=["store_name_normalized"]),
             models.Index(fields=["seller_status"]),
             models.Index(fields=["store_type"]),
         ]
@@ -378,13 +412,19 @@ class StoreOwner(BaseUser):
     def __str__(self):
         return f"{self.store_name} - {self.full_name}"
 
+    # Maintained with atomic updates; full saves of an existing store leave them alone
+    COUNTER_FIELDS = ("active_products_count", "total_sales", "total_revenue", "seller_rating", "store_rating")
+
+    # StoreRating kind -> {sum, count} field it feeds
+    RATING_FIELDS = {"seller": "seller_rating", "store": "store_rating"}
+
     def save(self, *args, **kwargs):
         self.user_type = 'store_owner'
         # Initialize default values for JSON fields if empty
         if not self.seller_rating:
-            self.seller_rating = {"average": 0, "count": 0}
+            self.seller_rating = {"sum": 0, "count": 0}
         if not self.store_rating:
-            self.store_rating = {"average": 0, "count": 0}
+            self.store_rating = {"sum": 0, "count": 0}
         if not self.supported_languages:
             self.supported_languages = ["fa"]
         if not self.supported_currencies:
@@ -395,7 +435,22 @@ class StoreOwner(BaseUser):
             self.working_hours = {}
         if not self.payment_settings:
             self.payment_settings = {}
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "store_name" in update_fields:
+            self.store_name_normalized = normalize_text(self.store_name)
+            if update_fields is not None:
+                kwargs["update_fields"] = set(update_fields) | {"store_name_normalized"}
+        if update_fields is None and not self._state.adding and not kwargs.get("force_insert"):
+            # A stale in-memory copy must not overwrite concurrent $inc updates
+            skipped = set(self.COUNTER_FIELDS) | self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skipped and field.name not in skipped
+            ]
         super().save(*args, **kwargs)
+        # Store details are embedded in product and category listings
+        bump_versions([CATALOG_SCOPE, STORES_SCOPE, ('store', str(self.pk))])
 
     
     # Store Logo Methods
@@ -429,48 +484,116 @@ class StoreOwner(BaseUser):
         return self
     
     # Rating Methods
-    def update_seller_rating(self, new_rating):
-        """Update seller rating with new rating value"""
-        current = self.seller_rating or {"average": 0, "count": 0}
-        count = current.get("count", 0)
-        average = current.get("average", 0)
-        
-        new_count = count + 1
-        new_average = ((average * count) + new_rating) / new_count
-        
-        self.seller_rating = {
-            "average": round(new_average, 2),
-            "count": new_count
-        }
-        self.save(update_fields=["seller_rating"])
-    
-    def update_store_rating(self, new_rating):
-        """Update store rating with new rating value"""
-        current = self.store_rating or {"average": 0, "count": 0}
-        count = current.get("count", 0)
-        average = current.get("average", 0)
-        
-        new_count = count + 1
-        new_average = ((average * count) + new_rating) / new_count
-        
-        self.store_rating = {
-            "average": round(new_average, 2),
-            "count": new_count
+    @staticmethod
+    def rating_summary(value):
+        """Public {average, count} derived from a stored {sum, count} (or a legacy {average, count})"""
+        value = value or {}
+        count = value.get("count", 0) or 0
+        if "sum" in value:
+            average = round(value["sum"] / count, 2) if count else 0
+        else:
+            average = value.get("average", 0)
+        return {"average": average, "count": count}
+
+    @property
+    def seller_rating_summary(self):
+        return self.rating_summary(self.seller_rating)
+
+    @property
+    def store_rating_summary(self):
+        return self.rating_summary(self.store_rating)
+
+    def rate(self, rater, kind, value):
+        """
+        Record `rater`'s rating of this seller or store and fold it into the running sum/count.
+        Each rater holds one rating per kind: rating again replaces the previous value.
+        """
+        field = self.RATING_FIELDS[kind]
+        value = Decimal(str(value)).quantize(Decimal("0.1"))
+        now = timezone.now()
+        previous = get_collection(StoreRating).find_one_and_update(
+            {"store_id": self.pk, "rater_id": rater.pk, "kind": kind},
+            {"$set": {"rating": Decimal128(value), "updated_at": now}, "$setOnInsert": {"created_at": now}},
+            upsert=True,
+            projection={"rating": 1},
+            return_document=ReturnDocument.BEFORE,
+        )
+        if previous is None:
+            sum_delta, count_delta = float(value), 1
+        else:
+            sum_delta, count_delta = float(value - previous["rating"].to_decimal()), 0
+
+        collection = get_collection(StoreOwner)
+        # Multi-table child: the pk is the parent link column, not the document _id
+        pk_column = StoreOwner._meta.pk.column
+        increment = {
+            "filter": {pk_column: self.pk, f"{field}.sum": {"$exists": True}},
+            "update": {"$inc": {f"{field}.sum": sum_delta, f"{field}.count": count_delta}},
+            "projection": {field: 1},
+            "return_document": ReturnDocument.AFTER,
         }
-        self.save(update_fields=["store_rating"])
+        document = collection.find_one_and_update(**increment)
+        if document is None:
+            # Convert a legacy {average, count} value to {sum, count} once, then apply the $inc
+            count = {"$ifNull": [f"${field}.count", 0]}
+            collection.update_one(
+                {pk_column: self.pk, f"{field}.sum": {"$exists": False}},
+                [{"$set": {field: {
+                    "sum": {"$multiply": [{"$ifNull": [f"${field}.average", 0]}, count]},
+                    "count": count,
+                }}}],
+            )
+            document = collection.find_one_and_update(**increment)
+        if document is not None:
+            setattr(self, field, document[field])
+        bump_versions([STORES_SCOPE, ("store", str(self.pk))])
+        return self.rating_summary(getattr(self, field))
     
     # Statistics Methods
+    @staticmethod
+    def counter_increments(deltas):
+        return {
+            field: Decimal128(str(value)) if isinstance(value, Decimal) else value
+            for field, value in deltas.items() if value
+        }
+
+    @classmethod
+    def increment_counters(cls, store_id, session=None, **deltas):
+        """Atomically $inc statistics counters (active_products_count, total_sales, total_revenue) of a store"""
+        increments = cls.counter_increments(deltas)
+        if increments:
+            get_collection(cls).update_one({cls._meta.pk.column: store_id}, {"$inc": increments}, session=session)
+
+    @classmethod
+    def increment_counters_many(cls, deltas_by_store, session=None):
+        """Counters of several stores in one bulk write: {store_id: {field: delta}}"""
+        operations = []
+        for store_id, deltas in deltas_by_store.items():
+            increments = cls.counter_increments(deltas)
+            if increments:
+                operations.append(UpdateOne({cls._meta.pk.column: store_id}, {"$inc": increments}))
+        if operations:
+            get_collection(cls).bulk_write(operations, ordered=False, session=session)
+
     def increment_sales(self, amount):
         """Increment total sales and revenue"""
+        amount = Decimal(str(amount))
+        StoreOwner.increment_counters(self.pk, total_sales=1, total_revenue=amount)
         self.total_sales += 1
         self.total_revenue += amount
-        self.save(update_fields=["total_sales", "total_revenue"])
 
     def update_active_products_count(self, count):
         """Update active products count"""
         self.active_products_count = count
         self.save(update_fields=["active_products_count"])
 
+    def sync_product_cards(self):
+        """Propagate the store name into the card snapshot of all of this store's products"""
+        get_collection(Product).update_many(
+            {"store_owner_id": self.pk},
+            {"$set": {"card.store_name": self.store_name}},
+        )
+
 
 class ProductImage(models.Model):
     """
@@ -506,8 +629,34 @@ class ProductImage(models.Model):
             # Ensure only one primary image per product
             ProductImage.objects.filter(product=self.product, is_primary=True).update(is_primary=False)
         super().save(*args, **kwargs)
+        # Keep the product card's primary image and image count current
+        self.product.refresh_card()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.product.refresh_card()
+        return result
+
+
 
 
+class ProductQuerySet(models.QuerySet):
+    """Custom queryset for Product model"""
+
+    def with_listing_relations(self, store_owner=True, images=True):
+        """Batch-load store owners and ordered images so rendering a page costs a fixed number of queries"""
+        lookups = []
+        if store_owner:
+            lookups.append(models.Prefetch(
+                'store_owner',
+                queryset=StoreOwner.objects.only('id', 'store_name', 'first_name', 'last_name'),
+            ))
+        if images:
+            lookups.append(models.Prefetch(
+                'images',
+                queryset=ProductImage.objects.order_by('-is_primary', 'created_at'),
+            ))
+        return self.prefetch_related(*lookups)
 
 
 class Product(models.Model):
@@ -553,6 +702,12 @@ class Product(models.Model):
         error_messages={'required': "کد محصول الزامی است"}
     )
 
+    # Normalized shadow fields used for lookups and search (maintained on save)
+    title_normalized = models.CharField(max_length=255, blank=True, default="", editable=False)
+    description_normalized = models.TextField(blank=True, default="", editable=False)
+    sku_normalized = models.CharField(max_length=100, blank=True, default="", editable=False)
+    tags_normalized = models.JSONField(default=list, blank=True, editable=False)
+
     # Pricing
     price = models.DecimalField(
         max_digits=10,
@@ -623,17 +778,39 @@ class Product(models.Model):
         default=0,
         help_text="تعداد فروش"
     )
+    # Time-decayed scores kept in log2 form (see decay.py)
+    trending_score = models.FloatField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="امتیاز ترند (کاهشی با زمان)"
+    )
+    best_seller_score = models.FloatField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="امتیاز پرفروش (کاهشی با زمان)"
+    )
 
     # Rating system
     rating = models.JSONField(
         default=dict,
         blank=True,
-        help_text="امتیاز محصول (average, count)"
+        help_text="امتیاز محصول (average, count, sum, histogram)"
+    )
+
+    # Denormalized listing snapshot (title, prices, primary image, image count, store name, rating)
+    card = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="خلاصه کارت محصول برای صفحات فهرست"
     )
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         # Compound unique index for SKU per store owner
         constraints = [
@@ -644,10 +821,30 @@ class Product(models.Model):
         ]
         indexes = [
             models.Index(fields=['store_owner', 'sku']),
+            models.Index(fields=['store_owner', 'sku_normalized']),
             models.Index(fields=['store_owner', 'status']),
             models.Index(fields=['store_owner', 'category']),
             models.Index(fields=['status']),
             models.Index(fields=['category']),
+            # Stores per category: $match on category/status, $group by store
+            models.Index(fields=['category', 'status', 'store_owner']),
+            # Facet filters (sizes/colors/tags are arrays, so these are multikey)
+            models.Index(fields=['status', 'category', 'price']),
+            models.Index(fields=['status', 'sizes']),
+            models.Index(fields=['status', 'colors']),
+            models.Index(fields=['status', 'tags']),
+            # Keyset pagination indexes (created_at, id)
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['status', '-created_at', '-id']),
+            models.Index(fields=['store_owner', '-created_at', '-id']),
+            models.Index(fields=['store_owner', 'status', '-created_at', '-id']),
+            # Top-K ranking refreshes per scope
+            models.Index(fields=['status', '-trending_score']),
+            models.Index(fields=['status', 'category', '-trending_score']),
+            models.Index(fields=['store_owner', 'status', '-trending_score']),
+            models.Index(fields=['status', '-best_seller_score']),
+            models.Index(fields=['status', 'category', '-best_seller_score']),
+            models.Index(fields=['store_owner', 'status', '-best_seller_score']),
         ]
         verbose_name = "Product"
         verbose_name_plural = "Products"
@@ -655,12 +852,112 @@ class Product(models.Model):
     def __str__(self):
         return f"{self.title} - {self.sku}"
 
+    # Fields copied into the card snapshot on every save
+    CARD_SOURCE_FIELDS = ("title", "price", "compare_price", "rating")
+
+    # Maintained with atomic updates; full saves of an existing product leave them alone
+    COUNTER_FIELDS = ("rating", "views", "sales_count", "trending_score", "best_seller_score")
+
+    # Rating histogram buckets (ratings are rounded half up to a whole star)
+    RATING_STARS = range(6)
+
+    # Source field -> normalized shadow field
+    NORMALIZED_FIELDS = {
+        "title": "title_normalized",
+        "description": "description_normalized",
+        "sku": "sku_normalized",
+        "tags": "tags_normalized",
+    }
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember stored values so saves can tell what changed
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def get_cache_scopes(self):
+        """Response cache scopes affected by a change to this product"""
+        scopes = [
+            CATALOG_SCOPE,
+            ("product", str(self.pk)),
+            ("store", str(self.store_owner_id)),
+            ("category", self.category),
+        ]
+        loaded_category = getattr(self, "_loaded_values", {}).get("category")
+        if loaded_category and loaded_category != self.category:
+            scopes.append(("category", loaded_category))
+        return scopes
+
     def save(self, *args, **kwargs):
         # Initialize rating if empty
         if not self.rating:
-            self.rating = {"average": 0, "count": 0}
+            self.rating = self.build_rating_aggregate(0, 0, {})
+
+        adding = self._state.adding
+        update_fields = kwargs.get("update_fields")
+        derived_fields = set()
+        if update_fields is None or set(update_fields) & set(self.CARD_SOURCE_FIELDS):
+            self.card = self.build_card()
+            derived_fields.add("card")
+        if update_fields is None or set(update_fields) & set(self.NORMALIZED_FIELDS):
+            self.normalize_fields()
+            derived_fields.update(self.NORMALIZED_FIELDS.values())
+        previous_state = None
+        if update_fields is None or {"category", "status"} & set(update_fields):
+            previous_state = self.get_stored_listing_state()
+        if update_fields is not None:
+            kwargs["update_fields"] = set(update_fields) | derived_fields
+        elif not self._state.adding and not kwargs.get("force_insert"):
+            # A stale in-memory copy must not overwrite concurrent $inc updates
+            skipped = set(self.COUNTER_FIELDS) | self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skipped and field.name not in skipped
+            ]
         super().save(*args, **kwargs)
 
+        if update_fields is None or {"category", "status"} & set(update_fields):
+            self.update_active_counts(previous_state, (self.category, self.status))
+        # View counts are allowed to lag in cached responses
+        if update_fields is None or not set(update_fields) <= {"views"}:
+            bump_versions(self.get_cache_scopes())
+        loaded = {**getattr(self, "_loaded_values", {}), "category": self.category, "status": self.status}
+        if adding or (update_fields is not None and "rating" in update_fields):
+            # Written just now, so the in-memory aggregate is the stored one
+            loaded["rating"] = self.rating
+        self._loaded_values = loaded
+
+    def delete(self, *args, **kwargs):
+        scopes = self.get_cache_scopes()
+        previous_state = self.get_stored_listing_state()
+        result = super().delete(*args, **kwargs)
+        self.update_active_counts(previous_state, None)
+        bump_versions(scopes)
+        return result
+
+    # Active Count Methods
+    def get_stored_listing_state(self):
+        """(category, status) as currently stored, or None for a product not saved yet"""
+        if self._state.adding:
+            return None
+        loaded = getattr(self, "_loaded_values", {})
+        if "category" in loaded and "status" in loaded:
+            return loaded["category"], loaded["status"]
+        return Product.objects.filter(pk=self.pk).values_list("category", "status").first()
+
+    def update_active_counts(self, previous, current):
+        """
+        Move this product's contribution as its (category, status) changes: the CategoryStore
+        rows per category and the store's active_products_count
+        """
+        deltas = {}
+        for state, delta in ((previous, -1), (current, 1)):
+            if state and state[1] == self.Status.ACTIVE:
+                deltas[state[0]] = deltas.get(state[0], 0) + delta
+        CategoryStore.increment(self.store_owner_id, deltas)
+        StoreOwner.increment_counters(self.store_owner_id, active_products_count=sum(deltas.values()))
+
     # Product Properties
     @property
     def is_in_stock(self):
@@ -706,17 +1003,72 @@ class Product(models.Model):
         """Remove an image by its ID"""
         try:
             product_image = ProductImage.objects.get(id=image_id, product=self)
+            product_image.product = self
             product_image.image.delete(save=False)  # Delete the file
             product_image.delete()
             # If we removed the primary image, make the first remaining image primary
             if product_image.is_primary and self.images.exists() and not self.images.filter(is_primary=True).exists():
                 first_image = self.images.first()
+                first_image.product = self
                 first_image.is_primary = True
                 first_image.save()
             return product_image
         except ProductImage.DoesNotExist:
             return None
 
+    def normalize_fields(self):
+        """Fill the normalized shadow fields from their sources"""
+        self.title_normalized = normalize_text(self.title)
+        self.description_normalized = normalize_text(self.description)
+        self.sku_normalized = normalize_sku(self.sku)
+        self.tags_normalized = [normalize_text(tag) for tag in (self.tags or []) if isinstance(tag, str)]
+
+    # Card Snapshot Methods
+    def get_stored_rating(self):
+        """
+        Rating aggregate as stored. Full saves never write `rating`, so an unsaved in-memory
+        value of an existing product must not leak into the card snapshot.
+        """
+        if self._state.adding:
+            return self.rating
+        loaded = getattr(self, "_loaded_values", {})
+        if "rating" in loaded:
+            return loaded["rating"]
+        document = get_collection(Product).find_one({"_id": self.pk}, {"rating": 1})
+        return (document or {}).get("rating")
+
+    def build_card(self, **overrides):
+        """Build the card snapshot from this product's own fields, keeping image and store data"""
+        card = dict(self.card or {})
+        rating = self.get_stored_rating() or {}
+        card.update({
+            "title": self.title,
+            "price": str(self.price) if self.price is not None else None,
+            "compare_price": str(self.compare_price) if self.compare_price is not None else None,
+            "rating": {
+                "average": rating.get("average", 0),
+                "count": rating.get("count", 0),
+            },
+        })
+        card.setdefault("primary_image", None)
+        card.setdefault("images_count", 0)
+        if "store_name" not in card and self.store_owner_id:
+            card["store_name"] = self.store_owner.store_name
+        card.update(overrides)
+        return card
+
+    def refresh_card(self, save=True):
+        """Recompute the image and store parts of the card snapshot"""
+        images = list(self.images.order_by("-is_primary", "created_at"))
+        self.card = self.build_card(
+            primary_image=images[0].image.url if images else None,
+            images_count=len(images),
+            store_name=self.store_owner.store_name,
+        )
+        if save:
+            self.save(update_fields=["card", "updated_at"])
+        return self.card
+
     def get_primary_image_url(self):
         """Get the primary image URL"""
         primary_img = self.images.filter(is_primary=True).first()
@@ -730,6 +1082,7 @@ class Product(models.Model):
         """Set an image as primary by its ID"""
         try:
             img = ProductImage.objects.get(id=image_id, product=self)
+            img.product = self
             ProductImage.objects.filter(product=self, is_primary=True).update(is_primary=False)
             img.is_primary = True
             img.save()
@@ -738,45 +1091,221 @@ class Product(models.Model):
             return False
 
     # Rating Methods
-    def update_rating(self):
-        """Recalculate product rating based on all individual ratings"""
-        ratings = self.ratings.all()
-        if ratings:
-            ratings_list = [r.rating for r in ratings]
-            average = sum(ratings_list) / len(ratings_list)
-            count = len(ratings_list)
-        else:
-            average = 0
-            count = 0
+    @classmethod
+    def rating_star(cls, value):
+        """Histogram bucket of a rating value"""
+        return min(max(int(math.floor(float(value) + 0.5)), cls.RATING_STARS[0]), cls.RATING_STARS[-1])
+
+    @classmethod
+    def build_rating_aggregate(cls, total, count, histogram):
+        """Rating dict stored on the product from a sum, a count and per-star counts"""
+        return {
+            "average": round(total / count, 2) if count else 0,
+            "count": count,
+            "sum": round(total, 1),
+            "histogram": {str(star): histogram.get(str(star), 0) for star in cls.RATING_STARS},
+        }
 
-        self.rating = {
-            "average": round(float(average), 2),
-            "count": count
+    def apply_rating_change(self, added=None, removed=None):
+        """
+        Fold one rating change into the running aggregate in a single atomic update:
+        a new rating passes `added`, a deleted one `removed`, an edit passes both.
+        """
+        sum_delta = (float(added) if added is not None else 0) - (float(removed) if removed is not None else 0)
+        count_delta = (added is not None) - (removed is not None)
+        star_deltas = {}
+        if added is not None:
+            star = str(self.rating_star(added))
+            star_deltas[star] = star_deltas.get(star, 0) + 1
+        if removed is not None:
+            star = str(self.rating_star(removed))
+            star_deltas[star] = star_deltas.get(star, 0) - 1
+
+        count = {"$ifNull": ["$rating.count", 0]}
+        # Documents written before the running sum existed start from average * count
+        total = {"$ifNull": ["$rating.sum", {"$multiply": [{"$ifNull": ["$rating.average", 0]}, count]}]}
+        increments = {
+            "rating.sum": {"$round": [{"$add": [total, sum_delta]}, 1]},
+            "rating.count": {"$add": [count, count_delta]},
+        }
+        for star, delta in star_deltas.items():
+            if delta:
+                increments[f"rating.histogram.{star}"] = {
+                    "$add": [{"$ifNull": [f"$rating.histogram.{star}", 0]}, delta]
+                }
+        average = {
+            "$cond": [
+                {"$gt": ["$rating.count", 0]},
+                {"$round": [{"$divide": ["$rating.sum", "$rating.count"]}, 2]},
+                0,
+            ]
         }
-        self.save(update_fields=["rating"])
+        if added is not None and removed is None and float(added) > 0:
+            # A new rating counts toward trending in proportion to its stars
+            weight = decay.trending_weight("rating") * float(added) / self.RATING_STARS[-1]
+            increments["trending_score"] = decay.add_expression(
+                "trending_score", decay.log_score("trending", weight)
+            )
+        document = get_collection(Product).find_one_and_update(
+            {"_id": self.pk},
+            [
+                {"$set": increments},
+                {"$set": {"rating.average": average, "updated_at": "$$NOW"}},
+                {"$set": {"card.rating": {"average": "$rating.average", "count": "$rating.count"}}},
+            ],
+            projection={"rating": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        if document is not None:
+            self.rating = document["rating"]
+            self._loaded_values = {**getattr(self, "_loaded_values", {}), "rating": self.rating}
+            self.card = self.build_card()
+            bump_versions(self.get_cache_scopes())
+        return self.rating
 
     def add_rating(self, customer, rating_value):
         """Add a new rating from a customer"""
-        # Create the rating (will raise IntegrityError if already exists due to unique constraint)
+        # Create the rating (will raise IntegrityError if already exists due to unique constraint);
+        # saving the rating updates the aggregate
         ProductRating.objects.create(
             customer=customer,
             product=self,
             rating=rating_value
         )
-        # Recalculate aggregate rating
-        self.update_rating()
+        self.refresh_from_db(fields=["rating", "card"])
+        self._loaded_values = {**getattr(self, "_loaded_values", {}), "rating": self.rating}
         return self
 
     # Analytics Methods
     def increment_views(self):
-        """Increment view count"""
-        self.views += 1
-        self.save(update_fields=["views"])
+        """Buffer a view; the count is flushed to the database in bulk by the view counter"""
+        from .counters import product_views
+        return self.views + product_views.add(self.pk)
+
+    @staticmethod
+    def sale_fields(quantity):
+        """Update-pipeline $set fields recording a sale: sales count, decayed scores and updated_at"""
+        return {
+            "sales_count": {"$add": [{"$ifNull": ["$sales_count", 0]}, quantity]},
+            "trending_score": decay.add_expression(
+                "trending_score", decay.log_score("trending", decay.trending_weight("sale") * quantity)
+            ),
+            "best_seller_score": decay.add_expression(
+                "best_seller_score", decay.log_score("best_sellers", quantity)
+            ),
+            "updated_at": "$$NOW",
+        }
+
+    def increment_sales(self, quantity=1):
+        """Atomically increment the sales count and feed the decayed trending/best-seller scores"""
+        get_collection(Product).update_one({"_id": self.pk}, [{"$set": self.sale_fields(quantity)}])
+        self.sales_count += quantity
+
+
+class CategoryStore(models.Model):
+    """
+    Materialized (category, store, active product count) rows answering which stores sell in a
+    category. Kept current with atomic $inc from Product.save/delete; rebuilt by rebuild_category_stores.
+    """
+    id = ObjectIdAutoField(primary_key=True)
+
+    category = models.CharField(
+        max_length=20,
+        choices=Product.Category.choices,
+        help_text="دسته‌بندی"
+    )
+    store = models.ForeignKey(
+        StoreOwner,
+        on_delete=models.CASCADE,
+        related_name='category_counts',
+        help_text="فروشگاه"
+    )
+    active_count = models.IntegerField(
+        default=0,
+        help_text="تعداد محصولات فعال فروشگاه در این دسته‌بندی"
+    )
+
+    class Meta:
+        verbose_name = "Category Store"
+        verbose_name_plural = "Category Stores"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['category', 'store'],
+                name='unique_category_store'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['category', '-active_count']),
+        ]
+
+    def __str__(self):
+        return f"{self.category} / {self.store_id}: {self.active_count}"
+
+    @classmethod
+    def increment(cls, store_id, deltas):
+        """Atomically add {category: delta} to a store's rows, creating missing rows"""
+        operations = [
+            UpdateOne(
+                {"category": category, "store_id": store_id},
+                {"$inc": {"active_count": delta}},
+                upsert=True,
+            )
+            for category, delta in deltas.items() if delta
+        ]
+        if operations:
+            get_collection(cls).bulk_write(operations, ordered=False)
+
+
+class StoreRating(models.Model):
+    """
+    One user's rating of a seller or a store. The unique constraint keeps a single rating per
+    rater and kind; StoreOwner.rate applies only the change to the store's running sum/count.
+    """
+    class Kind(models.TextChoices):
+        SELLER = "seller", "Seller"
+        STORE = "store", "Store"
+
+    id = ObjectIdAutoField(primary_key=True)
+
+    store = models.ForeignKey(
+        StoreOwner,
+        on_delete=models.CASCADE,
+        related_name='received_ratings',
+        help_text="فروشگاه مورد امتیاز"
+    )
+    rater = models.ForeignKey(
+        BaseUser,
+        on_delete=models.CASCADE,
+        related_name='given_store_ratings',
+        help_text="کاربری که امتیاز داده است"
+    )
+    kind = models.CharField(
+        max_length=10,
+        choices=Kind.choices,
+        help_text="نوع امتیاز (فروشنده یا فروشگاه)"
+    )
+    rating = models.DecimalField(
+        max_digits=2,
+        decimal_places=1,
+        validators=[MinValueValidator(0), MaxValueValidator(5)],
+        help_text="امتیاز داده شده (0-5)"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Store Rating"
+        verbose_name_plural = "Store Ratings"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['store', 'rater', 'kind'],
+                name='unique_store_rater_kind'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.rater_id} rated {self.kind} {self.store_id}: {self.rating}"
 
-    def increment_sales(self):
-        """Increment sales count"""
-        self.sales_count += 1
-        self.save(update_fields=["sales_count"])
 
 class ProductRating(models.Model):
     """
@@ -829,6 +1358,32 @@ class ProductRating(models.Model):
     def __str__(self):
         return f"{self.customer.full_name} rated {self.product.title}: {self.rating}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_rating = dict(zip(field_names, values)).get("rating")
+        return instance
+
+    def save(self, *args, **kwargs):
+        previous = getattr(self, "_loaded_rating", None) if not self._state.adding else None
+        super().save(*args, **kwargs)
+        # Apply only the delta to the product's running aggregate
+        if previous is None:
+            self.product.apply_rating_change(added=self.rating)
+        elif float(previous) != float(self.rating):
+            self.product.apply_rating_change(added=self.rating, removed=previous)
+        self._loaded_rating = self.rating
+
+    def delete(self, *args, **kwargs):
+        product, previous = self.product, getattr(self, "_loaded_rating", self.rating)
+        result = super().delete(*args, **kwargs)
+        product.apply_rating_change(removed=previous)
+        return result
+
+
+class CartConflict(Exception):
+    """A cart line kept changing under concurrent requests; the client should retry"""
+
 
 class Cart(models.Model):
     """
@@ -856,6 +1411,166 @@ class Cart(models.Model):
     def __str__(self):
         return f"Cart for {self.user_id.full_name}"
 
+    # Item Methods - targeted atomic updates; the rest of the document is never rewritten
+    def _update_items(self, query, update):
+        """Apply one update to this cart's document; returns whether a document matched"""
+        result = get_collection(Cart).update_one(
+            {"_id": self.pk, **query},
+            {**update, "$currentDate": {"updated_at": True}},
+        )
+        return result.matched_count > 0
+
+    def add_item(self, item):
+        """
+        Add a validated item, or add its quantity to the line already holding the product.
+        Returns True when a new line was pushed, False when an existing quantity was raised.
+        """
+        product_id = item["product_id"]
+        for _ in range(2):
+            if self._update_items(
+                {"items.product_id": product_id},
+                {"$inc": {"items.$.quantity": item["quantity"]}},
+            ):
+                return False
+            # The $ne guard keeps two concurrent first adds from pushing duplicate lines;
+            # the loser retries the positional $inc
+            if self._update_items(
+                {"items.product_id": {"$ne": product_id}},
+                {"$push": {"items": item}},
+            ):
+                return True
+        raise CartConflict("Cart item changed concurrently")
+
+    def update_item(self, product_id, changes):
+        """Set fields of one line in place; returns the updated item, or None when it is not in the cart"""
+        if not changes:
+            return next((item for item in self.items if item["product_id"] == product_id), None)
+        document = get_collection(Cart).find_one_and_update(
+            {"_id": self.pk, "items.product_id": product_id},
+            {
+                "$set": {f"items.$.{field}": value for field, value in changes.items()},
+                "$currentDate": {"updated_at": True},
+            },
+            projection={"items": {"$elemMatch": {"product_id": product_id}}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if document is None or not document.get("items"):
+            return None
+        return document["items"][0]
+
+    def remove_item(self, product_id):
+        """$pull one line by product id; returns whether it was in the cart"""
+        return self._update_items(
+            {"items.product_id": product_id},
+            {"$pull": {"items": {"product_id": product_id}}},
+        )
+
+    def clear(self):
+        """Empty the cart"""
+        self._update_items({}, {"$set": {"items": []}})
+
+    def take_items(self, items, session=None):
+        """
+        Atomically remove exactly these lines for checkout. Fails (returns False) when any of
+        them was removed or changed quantity meanwhile, so a cart cannot be checked out twice.
+        """
+        result = get_collection(Cart).update_one(
+            {"_id": self.pk, "items": {"$all": [
+                {"$elemMatch": {"product_id": item["product_id"], "quantity": item["quantity"]}}
+                for item in items
+            ]}},
+            {
+                "$pull": {"items": {"product_id": {"$in": [item["product_id"] for item in items]}}},
+                "$currentDate": {"updated_at": True},
+            },
+            session=session,
+        )
+        return result.matched_count > 0
+
+    def return_items(self, items):
+        """Put back lines taken by a checkout that then failed"""
+        self._update_items({}, {"$push": {"items": {"$each": list(items)}}})
+
+    def reprice(self, persist=False):
+        """
+        Compare every line with the product's current price, status and stock (one query)
+        and return per-item changes with snapshot and current totals. With persist=True the
+        changed price snapshots are written back in a single arrayFilters update.
+        """
+        ids = []
+        for item in self.items:
+            try:
+                ids.append(ObjectId(item["product_id"]))
+            except (InvalidId, TypeError):
+                pass
+        products = {
+            str(pk): (price, product_status, stock)
+            for pk, price, product_status, stock in Product.objects.filter(id__in=ids).values_list(
+                "id", "price", "status", "stock"
+            )
+        }
+
+        items = []
+        repriced = {}
+        snapshot_total = Decimal("0")
+        current_total = Decimal("0")
+        for item in self.items:
+            quantity = item.get("quantity", 0)
+            snapshot = Decimal(str(item.get("price_snapshot", 0))).quantize(Decimal("0.01"))
+            snapshot_total += snapshot * quantity
+            entry = {
+                "product_id": item["product_id"],
+                "quantity": quantity,
+                "price_snapshot": str(snapshot),
+                "current_price": None,
+                "available_stock": 0,
+                "issues": [],
+            }
+            if item["product_id"] not in products:
+                entry["issues"].append("missing")
+                items.append(entry)
+                continue
+
+            price, product_status, stock = products[item["product_id"]]
+            entry["current_price"] = str(price)
+            entry["available_stock"] = stock
+            if price != snapshot:
+                entry["issues"].append("price_changed")
+                repriced[item["product_id"]] = float(price)
+            if product_status != Product.Status.ACTIVE:
+                entry["issues"].append("inactive")
+            elif stock <= 0:
+                entry["issues"].append("out_of_stock")
+            elif stock < quantity:
+                entry["issues"].append("insufficient_stock")
+            if product_status == Product.Status.ACTIVE and stock > 0:
+                # Only purchasable lines count, capped at what is in stock
+                current_total += price * min(quantity, stock)
+            items.append(entry)
+
+        if persist and repriced:
+            updates = {}
+            array_filters = []
+            for index, (product_id, price) in enumerate(repriced.items()):
+                updates[f"items.$[i{index}].price_snapshot"] = price
+                array_filters.append({f"i{index}.product_id": product_id})
+            get_collection(Cart).update_one(
+                {"_id": self.pk},
+                {"$set": updates, "$currentDate": {"updated_at": True}},
+                array_filters=array_filters,
+            )
+            for item in self.items:
+                if item["product_id"] in repriced:
+                    item["price_snapshot"] = repriced[item["product_id"]]
+
+        return {
+            "items": items,
+            "changed": any(entry["issues"] for entry in items),
+            "snapshot_total": str(snapshot_total),
+            "current_total": str(current_total),
+            "persisted": bool(persist and repriced),
+        }
+
 
 class OrderItem(models.Model):
     """
@@ -902,6 +1617,17 @@ class OrderItem(models.Model):
     def __str__(self):
         return f"{self.title} x {self.quantity}"
 
+    @classmethod
+    def count_by_order(cls, order_ids):
+        """{order id: number of items} for many orders with one $group"""
+        return {
+            doc["_id"]: doc["count"]
+            for doc in get_collection(cls).aggregate([
+                {"$match": {"order_id": {"$in": list(order_ids)}}},
+                {"$group": {"_id": "$order_id", "count": {"$sum": 1}}},
+            ])
+        }
+
     def save(self, *args, **kwargs):
         # Calculate total if not provided
         if not self.total:
@@ -909,6 +1635,14 @@ class OrderItem(models.Model):
         super().save(*args, **kwargs)
 
 
+class OrderQuerySet(models.QuerySet):
+    """Custom queryset for Order model"""
+
+    def with_listing_relations(self, user=True, store=True, items=False):
+        """Batch-load customers, stores and optionally items so a page costs a fixed number of queries"""
+        return self.prefetch_related(*Order.listing_prefetches(user=user, store=store, items=items))
+
+
 class Order(models.Model):
     """
     Order model representing customer orders.
@@ -966,13 +1700,61 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = OrderQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Order"
         verbose_name_plural = "Orders"
+        indexes = [
+            # Keyset pagination indexes (created_at, id)
+            models.Index(fields=['user', '-created_at', '-id']),
+            models.Index(fields=['store', '-created_at', '-id']),
+        ]
 
     def __str__(self):
         return f"Order {self.id} by {self.user.full_name}"
 
+    # Orders in these statuses are left out of the sales rollups
+    UNCOUNTED_STATUSES = (Status.CANCELLED,)
+
+    @staticmethod
+    def listing_prefetches(user=True, store=True, items=False):
+        """Prefetch lookups for the customer, store and items (with their products) of many orders"""
+        lookups = []
+        if user:
+            lookups.append(models.Prefetch(
+                'user',
+                queryset=Customer.objects.only('id', 'first_name', 'last_name', 'phone'),
+            ))
+        if store:
+            lookups.append(models.Prefetch(
+                'store',
+                queryset=StoreOwner.objects.only('id', 'store_name', 'first_name', 'last_name'),
+            ))
+        if items:
+            lookups.append(models.Prefetch(
+                'items',
+                queryset=OrderItem.objects.prefetch_related(models.Prefetch(
+                    'product',
+                    queryset=Product.objects.only('id', 'title', 'sku', 'card'),
+                )),
+            ))
+        return lookups
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = dict(zip(field_names, values)).get("status")
+        return instance
+
+    def save(self, *args, **kwargs):
+        previous = getattr(self, "_loaded_status", None) if not self._state.adding else None
+        super().save(*args, **kwargs)
+        # Cancelling (or reinstating) an order moves its lines out of (or back into) the rollups
+        if previous is not None and (previous in self.UNCOUNTED_STATUSES) != (self.status in self.UNCOUNTED_STATUSES):
+            StoreSalesRollup.apply_order(self, -1 if self.status in self.UNCOUNTED_STATUSES else 1)
+        self._loaded_status = self.status
+
     def calculate_total(self):
         """Calculate total amount from order items"""
         total = sum(item.total for item in self.items.all())
@@ -981,6 +1763,192 @@ class Order(models.Model):
         return total
 
 
+class StoreSalesRollup(models.Model):
+    """
+    Pre-aggregated sales per store, UTC day and product, updated with $inc when orders are
+    created or cancelled so dashboards can answer any date range without scanning orders.
+    """
+    id = ObjectIdAutoField(primary_key=True)
+
+    store = models.ForeignKey(
+        StoreOwner,
+        on_delete=models.CASCADE,
+        related_name='sales_rollups',
+        help_text="فروشگاه"
+    )
+    day = models.DateTimeField(help_text="ابتدای روز (UTC)")
+    # History is kept when a product is removed
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+        help_text="محصول"
+    )
+    quantity = models.IntegerField(default=0, help_text="تعداد فروخته شده")
+    revenue = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        default=0,
+        help_text="درآمد"
+    )
+    lines = models.IntegerField(default=0, help_text="تعداد اقلام سفارش")
+
+    class Meta:
+        verbose_name = "Store Sales Rollup"
+        verbose_name_plural = "Store Sales Rollups"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['store', 'day', 'product'],
+                name='unique_store_day_product_rollup'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['store', 'day']),
+        ]
+
+    def __str__(self):
+        return f"{self.store_id} {self.day:%Y-%m-%d} {self.product_id}: {self.quantity}"
+
+    @staticmethod
+    def day_bucket(value):
+        """Midnight UTC of the day a timestamp (or date) falls on"""
+        if getattr(value, "tzinfo", None):
+            value = value.astimezone(dt_timezone.utc)
+        return datetime(value.year, value.month, value.day, tzinfo=dt_timezone.utc)
+
+    @classmethod
+    def increment(cls, rows, session=None):
+        """Atomically add {(store_id, day, product_id): (quantity, revenue, lines)} to the rollups"""
+        operations = [
+            UpdateOne(
+                {"store_id": store_id, "day": day, "product_id": product_id},
+                {"$inc": {
+                    "quantity": quantity,
+                    "revenue": Decimal128(str(revenue)),
+                    "lines": lines,
+                }},
+                upsert=True,
+            )
+            for (store_id, day, product_id), (quantity, revenue, lines) in rows.items()
+        ]
+        if operations:
+            get_collection(cls).bulk_write(operations, ordered=False, session=session)
+
+    @classmethod
+    def apply_order(cls, order, sign):
+        """Add (sign=1) or remove (sign=-1) one order's lines"""
+        day = cls.day_bucket(order.created_at)
+        rows = {}
+        for product_id, quantity, total in order.items.values_list("product_id", "quantity", "total"):
+            key = (order.store_id, day, product_id)
+            previous = rows.get(key, (0, Decimal("0"), 0))
+            rows[key] = (
+                previous[0] + sign * quantity,
+                previous[1] + sign * total,
+                previous[2] + sign,
+            )
+        cls.increment(rows)
+
+
+class ProductRanking(models.Model):
+    """
+    Materialized top-K product list per ranking kind and scope (all products, one category or
+    one store), ordered by a time-decayed score. Reads serve the stored list; it is recomputed
+    from the score indexes once older than RANKING_REFRESH_INTERVAL or by refresh_rankings.
+    """
+    class Kind(models.TextChoices):
+        TRENDING = "trending", "Trending"
+        BEST_SELLERS = "best_sellers", "Best sellers"
+
+    # Product field holding the decayed score of each kind
+    SCORE_FIELDS = {
+        Kind.TRENDING: "trending_score",
+        Kind.BEST_SELLERS: "best_seller_score",
+    }
+    DEFAULT_SIZE = 50
+    DEFAULT_REFRESH_INTERVAL = 300  # seconds
+
+    id = ObjectIdAutoField(primary_key=True)
+
+    kind = models.CharField(
+        max_length=20,
+        choices=Kind.choices,
+        help_text="نوع رتبه‌بندی"
+    )
+    scope = models.CharField(
+        max_length=64,
+        help_text="محدوده رتبه‌بندی (all، category:<دسته> یا store:<شناسه>)"
+    )
+    entries = models.JSONField(
+        default=list,
+        help_text="محصولات برتر به ترتیب امتیاز: [{id, score}]"
+    )
+    computed_at = models.DateTimeField(help_text="زمان محاسبه")
+
+    class Meta:
+        verbose_name = "Product Ranking"
+        verbose_name_plural = "Product Rankings"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'scope'],
+                name='unique_product_ranking_scope'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.kind} / {self.scope}: {len(self.entries)}"
+
+    @staticmethod
+    def scope_key(category=None, store_id=None):
+        """Scope string of a ranking list"""
+        if store_id is not None:
+            return f"store:{store_id}"
+        if category is not None:
+            return f"category:{category}"
+        return "all"
+
+    @classmethod
+    def size(cls):
+        return getattr(settings, "RANKING_SIZE", cls.DEFAULT_SIZE)
+
+    @classmethod
+    def refresh_interval(cls):
+        return getattr(settings, "RANKING_REFRESH_INTERVAL", cls.DEFAULT_REFRESH_INTERVAL)
+
+    @classmethod
+    def compute(cls, kind, category=None, store_id=None):
+        """Recompute one list with a single indexed top-K query and upsert it; returns the entries"""
+        field = cls.SCORE_FIELDS[kind]
+        products = Product.objects.filter(status=Product.Status.ACTIVE, **{f"{field}__isnull": False})
+        if category is not None:
+            products = products.filter(category=category)
+        if store_id is not None:
+            products = products.filter(store_owner_id=store_id)
+
+        now = timezone.now()
+        entries = [
+            {"id": str(pk), "score": round(decay.current_score(kind, score, now), 4)}
+            for pk, score in products.order_by(f"-{field}").values_list("id", field)[:cls.size()]
+        ]
+        get_collection(cls).update_one(
+            {"kind": kind, "scope": cls.scope_key(category, store_id)},
+            {"$set": {"entries": entries, "computed_at": now}},
+            upsert=True,
+        )
+        return entries
+
+    @classmethod
+    def get_entries(cls, kind, category=None, store_id=None):
+        """Stored list of a scope, recomputed first when missing or stale"""
+        ranking = cls.objects.filter(kind=kind, scope=cls.scope_key(category, store_id)).only(
+            "entries", "computed_at"
+        ).first()
+        if ranking is None or ranking.computed_at < timezone.now() - timedelta(seconds=cls.refresh_interval()):
+            return cls.compute(kind, category=category, store_id=store_id)
+        return ranking.entries
+
+
 class WishlistItem(models.Model):
     """
     Wishlist Item model representing individual items in a user's wishlist.
@@ -1064,8 +2032,10 @@ class Comment(models.Model):
             models.Index(fields=['author']),
             models.Index(fields=['parent']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['product', 'parent', '-created_at', '-id']),
         ]
-        ordering = ['created_at']
+        # Matches KeysetPagination, so listings and cursor pages agree
+        ordering = ['-created_at', '-id']
 
     def __str__(self):
         return f"Comment by {self.author.full_name} on {self.product.title}"
@@ -1076,8 +2046,8 @@ class Comment(models.Model):
         return self.parent is not None
 
     def get_replies(self):
-        """Get all direct replies to this comment"""
-        return self.replies.all()
+        """Get all direct replies to this comment, oldest first so threads read in order"""
+        return self.replies.order_by('created_at', 'id')
 
     def can_reply(self, user):
         """Check if a user can reply to this comment"""
@@ -0,0 +1,13 @@
+from django.db import connections, router
+
+
+def get_collection(model, using=None):
+    """Return the raw MongoDB collection backing a model (for atomic updates and aggregations)"""
+    alias = using or router.db_for_write(model)
+    return connections[alias].get_collection(model._meta.db_table)
+
+
+def supports_transactions(collection):
+    """Multi-document transactions need a replica set or a sharded cluster"""
+    topology = collection.database.client.topology_description.topology_type_name
+    return topology in ("ReplicaSetWithPrimary", "Sharded")
@@ -0,0 +1,67 @@
+import re
+import unicodedata
+
+
+# Arabic letter variants, Persian/Arabic-Indic digits and joiners mapped to one canonical form
+_CHARACTER_MAP = str.maketrans({
+    'ي': 'ی',
+    'ى': 'ی',
+    'ئ': 'ی',
+    'ك': 'ک',
+    'ة': 'ه',
+    'ە': 'ه',
+    'ۀ': 'ه',
+    'أ': 'ا',
+    'إ': 'ا',
+    'ٱ': 'ا',
+    'ؤ': 'و',
+    '\u200c': ' ',  # zero-width non-joiner
+    '\u200d': '',   # zero-width joiner
+    '\u200e': '',   # left-to-right mark
+    '\u200f': '',   # right-to-left mark
+    **{chr(0x06F0 + i): str(i) for i in range(10)},  # Persian digits
+    **{chr(0x0660 + i): str(i) for i in range(10)},  # Arabic-Indic digits
+})
+
+_DIGIT_MAP = str.maketrans({
+    **{chr(0x06F0 + i): str(i) for i in range(10)},
+    **{chr(0x0660 + i): str(i) for i in range(10)},
+})
+
+# Harakat, superscript alef and tatweel
+_DIACRITICS = re.compile('[\u064b-\u065f\u0670\u0640]')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_digits(value):
+    """Convert Persian and Arabic-Indic digits to ASCII digits"""
+    if value is None:
+        return value
+    return str(value).translate(_DIGIT_MAP)
+
+
+def normalize_text(value):
+    """Canonical form used for lookups: unified letters and digits, no diacritics, single spaces, casefolded"""
+    if value is None:
+        return ''
+    value = unicodedata.normalize('NFKC', str(value))
+    value = value.translate(_CHARACTER_MAP)
+    value = _DIACRITICS.sub('', value)
+    return _WHITESPACE.sub(' ', value).strip().casefold()
+
+
+def normalize_sku(value):
+    """SKUs compare without any whitespace"""
+    return _WHITESPACE.sub('', normalize_text(value))
+
+
+def normalize_phone(value):
+    """ASCII digits only, with a +98/0098 prefix turned into the local 0 prefix"""
+    if value is None:
+        return value
+    value = re.sub(r'[\s\-()]', '', normalize_digits(value))
+    if value.startswith('+98'):
+        value = '0' + value[3:]
+    elif value.startswith('0098'):
+        value = '0' + value[4:]
+    return value
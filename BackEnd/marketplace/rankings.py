@@ -0,0 +1,50 @@
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from .models import Product, ProductRanking
+from .serializers import ProductCardSerializer
+
+
+class RankingFilterError(ValueError):
+    """Raised for an unknown category, a malformed store id or a bad limit"""
+
+
+def parse_ranking_params(params):
+    """(category, store_id, limit) from query params"""
+    category = params.get('category') or None
+    if category is not None and category not in Product.Category.values:
+        raise RankingFilterError(f'Unknown category: {category}')
+
+    store_id = params.get('store') or None
+    if store_id is not None:
+        try:
+            store_id = ObjectId(store_id)
+        except (InvalidId, TypeError):
+            raise RankingFilterError('store must be a valid id')
+    if category is not None and store_id is not None:
+        raise RankingFilterError('Use either category or store, not both')
+
+    try:
+        limit = int(params.get('limit', 20))
+    except ValueError:
+        raise RankingFilterError('limit must be an integer')
+    return category, store_id, min(max(limit, 1), ProductRanking.size())
+
+
+def ranked_products(kind, category=None, store_id=None, limit=20):
+    """
+    Top products of a ranking: the materialized id list plus one $in read of the card
+    snapshots, so the cost is O(limit) whatever the catalog size
+    """
+    entries = ProductRanking.get_entries(kind, category=category, store_id=store_id)[:limit]
+    ids = [ObjectId(entry['id']) for entry in entries]
+    # Products deactivated since the list was computed are dropped until the next refresh
+    products = {
+        product.pk: product
+        for product in Product.objects.filter(id__in=ids, status=Product.Status.ACTIVE).only('id', 'card')
+    }
+    results = []
+    for entry, pk in zip(entries, ids):
+        if pk in products:
+            results.append({**ProductCardSerializer(products[pk]).data, 'score': entry['score']})
+    return results
@@ -0,0 +1,91 @@
+from django.conf import settings
+from pymongo.errors import OperationFailure
+
+from .models import Product
+from .mongo import get_collection
+from .normalization import normalize_text
+
+
+# Name of the MongoDB text index created after migrate (and by the ensure_indexes command)
+PRODUCT_TEXT_INDEX = 'product_text_search'
+
+# Normalized shadow fields so Arabic/Persian letter and digit variants match
+PRODUCT_TEXT_INDEX_FIELDS = {
+    'title_normalized': 10,
+    'tags_normalized': 5,
+    'description_normalized': 1,
+}
+
+# Server error code of a $text query on a collection without a text index
+INDEX_NOT_FOUND = 27
+
+DEFAULT_RANKING_WEIGHTS = {
+    'text': 1.0,
+    'sales': 0.3,
+    'views': 0.1,
+    'rating': 0.2,
+}
+
+
+class SearchUnavailable(Exception):
+    """The product text index is missing; run migrate or ensure_indexes"""
+
+
+def get_ranking_weights():
+    return {**DEFAULT_RANKING_WEIGHTS, **getattr(settings, 'SEARCH_RANKING_WEIGHTS', {})}
+
+
+def build_product_search_pipeline(query, category=None, skip=0, limit=20):
+    """
+    Aggregation returning the ids of active products matching `query`,
+    ranked by text score blended with (log-scaled) sales and views and the
+    average rating.
+    """
+    weights = get_ranking_weights()
+    match = {'$text': {'$search': normalize_text(query)}, 'status': Product.Status.ACTIVE}
+    if category:
+        match['category'] = category
+
+    return [
+        {'$match': match},
+        {'$project': {
+            'rank': {'$add': [
+                {'$multiply': [{'$meta': 'textScore'}, weights['text']]},
+                {'$multiply': [{'$ln': {'$add': [1, {'$ifNull': ['$sales_count', 0]}]}}, weights['sales']]},
+                {'$multiply': [{'$ln': {'$add': [1, {'$ifNull': ['$views', 0]}]}}, weights['views']]},
+                {'$multiply': [{'$ifNull': ['$rating.average', 0]}, weights['rating']]},
+            ]},
+        }},
+        {'$sort': {'rank': -1, '_id': -1}},
+        {'$skip': skip},
+        {'$limit': limit},
+    ]
+
+
+def search_product_ids(query, category=None, skip=0, limit=20):
+    """Return ranked product ids for one page of search results; raises SearchUnavailable"""
+    pipeline = build_product_search_pipeline(query, category=category, skip=skip, limit=limit)
+    try:
+        return [doc['_id'] for doc in get_collection(Product).aggregate(pipeline)]
+    except OperationFailure as e:
+        if e.code != INDEX_NOT_FOUND:
+            raise
+        raise SearchUnavailable('Product search index is missing')
+
+
+def ensure_product_text_index(using=None):
+    """Create (or keep) the weighted text index used by product search"""
+    collection = get_collection(Product, using=using)
+    # A collection can only have one text index; drop an outdated one first
+    for index in collection.list_indexes():
+        if 'textIndexVersion' not in index:
+            continue
+        if index['name'] != PRODUCT_TEXT_INDEX or dict(index.get('weights', {})) != PRODUCT_TEXT_INDEX_FIELDS:
+            collection.drop_index(index['name'])
+    return collection.create_index(
+        [(field, 'text') for field in PRODUCT_TEXT_INDEX_FIELDS],
+        name=PRODUCT_TEXT_INDEX,
+        weights=PRODUCT_TEXT_INDEX_FIELDS,
+        # Persian has no stemming support in MongoDB; index plain tokens
+        default_language='none',
+    )
@@ -1,6 +1,68 @@
+import copy
+
+from bson import ObjectId
+from bson.errors import InvalidId
 from rest_framework import serializers
+from django.db import models
 from django.utils import timezone
 from .models import Customer, StoreOwner, Product, ProductRating, ProductImage, Cart, Order, OrderItem, Wishlist, WishlistItem, Comment
+from .normalization import normalize_phone, normalize_sku, normalize_text
+from .checkout import CheckoutError, place_order
+from .users import resolve_user
+
+
+def normalize_phone_input(data):
+    """Return request data with the phone converted to ASCII digits before field validators run"""
+    phone = data.get('phone') if hasattr(data, 'get') else None
+    if isinstance(phone, str):
+        # Shallow copy: a deep copy would duplicate uploaded files
+        data = copy.copy(data)
+        data['phone'] = normalize_phone(phone)
+    return data
+
+
+class SparseFieldsetMixin:
+    """
+    Lets GET clients pick output fields with ?fields=a,b or a named preset with ?view=<name>.
+    `field_views` maps preset names to field lists and `field_sources` lists the model fields
+    a computed field reads, so views can project the query with only() via get_only_fields().
+    Only applies when this serializer is the view's own serializer, never when nested.
+    """
+    field_views = {}
+    field_sources = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        view = self.context.get('view')
+        if view is None or getattr(view, 'serializer_class', None) is not type(self):
+            return
+        requested = self.get_requested_fields(self.context.get('request'))
+        if requested is not None:
+            for name in set(self.fields) - set(requested):
+                self.fields.pop(name)
+
+    @classmethod
+    def get_requested_fields(cls, request):
+        """Requested field names (always including id), or None for the full representation"""
+        if request is None or request.method != 'GET':
+            return None
+        params = request.query_params
+        if params.get('fields'):
+            names = [name.strip() for name in params['fields'].split(',')]
+        elif params.get('view') in cls.field_views:
+            names = cls.field_views[params['view']]
+        else:
+            return None
+        known = [name for name in cls.Meta.fields if name in names and name != 'id']
+        return ['id', *known] if known else None
+
+    @classmethod
+    def get_only_fields(cls, requested):
+        """Model fields to load for the requested serializer fields"""
+        only = set()
+        for name in requested:
+            only.update(cls.field_sources.get(name, (name,)))
+        return sorted(only)
 
 
 class ProductImageSerializer(serializers.ModelSerializer):
@@ -66,7 +128,8 @@ class CustomerSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("تاریخ تولد باید در گذشته باشد")
         return value
 
-    
+    def to_internal_value(self, data):
+        return super().to_internal_value(normalize_phone_input(data))
 
     def create(self, validated_data):
         password = self.initial_data.get('password')
@@ -356,12 +419,12 @@ class OrderItemSerializer(serializers.ModelSerializer):
         return str(obj.id) if obj.id is not None else None
 
     def get_product(self, obj):
-        """Return product basic info"""
+        """Return product basic info; the image comes from the card snapshot, not an images query"""
         return {
             'id': str(obj.product.id),
             'title': obj.product.title,
             'sku': obj.product.sku,
-            'image': obj.product.get_primary_image_url(),
+            'image': (obj.product.card or {}).get('primary_image'),
         }
 
     def validate_quantity(self, value):
@@ -377,7 +440,23 @@ class OrderItemSerializer(serializers.ModelSerializer):
         return value
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderListSerializer(serializers.ListSerializer):
+    """Counts the items of every order on a page with one $group instead of a count() per order"""
+
+    def to_representation(self, data):
+        orders = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        pending = [
+            order.pk for order in orders
+            if 'items' not in getattr(order, '_prefetched_objects_cache', {})
+        ]
+        if pending and 'items_count' in self.child.fields:
+            counts = OrderItem.count_by_order(pending)
+            for order in orders:
+                order._items_count = counts.get(order.pk, 0)
+        return super().to_representation(orders)
+
+
+class OrderSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for Order model"""
     # Force ObjectId to string for DRF representation
     id = serializers.SerializerMethodField(read_only=True)
@@ -414,6 +493,21 @@ class OrderSerializer(serializers.ModelSerializer):
             'created_at',
             'updated_at',
         ]
+        list_serializer_class = OrderListSerializer
+
+    field_views = {
+        'card': ('id', 'store', 'total_amount', 'status', 'items_count', 'created_at'),
+    }
+    field_sources = {
+        'items': ('id',),
+        'items_count': ('id',),
+    }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Listings render items only when asked for (?include=items)
+        if self.context.get('include_items') is False:
+            self.fields.pop('items', None)
 
     def get_id(self, obj):
         return str(obj.id) if obj.id is not None else None
@@ -436,6 +530,10 @@ class OrderSerializer(serializers.ModelSerializer):
 
     def get_items_count(self, obj):
         """Return number of items in order"""
+        if 'items' in getattr(obj, '_prefetched_objects_cache', {}):
+            return len(obj.items.all())
+        if hasattr(obj, '_items_count'):
+            return obj._items_count
         return obj.items.count()
 
     def validate_total_amount(self, value):
@@ -474,78 +572,22 @@ class OrderSerializer(serializers.ModelSerializer):
         if not cart_items:
             raise serializers.ValidationError("آیتم‌های سبد خرید الزامی است")
 
-        try:
-            customer = Customer.objects.get(id=user.id)
-        except Customer.DoesNotExist:
+        customer = resolve_user(request, Customer)
+        if customer is None:
             raise serializers.ValidationError("مشتری یافت نشد")
 
-        # Validate cart items and create order items
-        order_items = []
-        total_amount = 0
-        store_id = None
-
-        for item in cart_items:
-            try:
-                product = Product.objects.get(id=item['product_id'], status='active')
-            except Product.DoesNotExist:
-                raise serializers.ValidationError(f"محصول با شناسه {item['product_id']} یافت نشد")
-
-            if not product.is_in_stock or product.stock < item['quantity']:
-                raise serializers.ValidationError(f"محصول {product.title} موجود نیست یا موجودی کافی ندارد")
-
-            # Check if all items are from the same store
-            if store_id and str(product.store_owner.id) != store_id:
-                raise serializers.ValidationError("تمام محصولات باید از یک فروشگاه باشند")
-            store_id = str(product.store_owner.id)
-
-            # Create order item data
-            price = product.price
-            quantity = item['quantity']
-            item_total = price * quantity
-
-            order_item = {
-                'product': product,
-                'title': product.title,
-                'price': price,
-                'quantity': quantity,
-                'total': item_total,
-            }
-            order_items.append(order_item)
-            total_amount += item_total
-
-        # Get store
+        # Oversell-safe placement: guarded stock updates, bulk inserts of the order and its items
         try:
-            store = StoreOwner.objects.get(id=store_id)
-        except StoreOwner.DoesNotExist:
-            raise serializers.ValidationError("فروشگاه یافت نشد")
-
-        # Create order
-        order = Order.objects.create(
-            user=customer,
-            store=store,
-            total_amount=total_amount,
-            shipping_address=validated_data.get('shipping_address'),
-            payment_method=validated_data.get('payment_method'),
-            status=validated_data.get('status', Order.Status.PENDING),
-            tracking_number=validated_data.get('tracking_number'),
-        )
-
-        # Create order items
-        for item_data in order_items:
-            OrderItem.objects.create(
-                order=order,
-                **item_data
+            order = place_order(
+                customer,
+                cart_items,
+                shipping_address=validated_data.get('shipping_address'),
+                payment_method=validated_data.get('payment_method'),
+                status=validated_data.get('status', Order.Status.PENDING),
+                tracking_number=validated_data.get('tracking_number'),
             )
-
-        # Update product stock and sales
-        for item_data in order_items:
-            product = item_data['product']
-            product.stock -= item_data['quantity']
-            product.sales_count += item_data['quantity']
-            product.save()
-
-            # Update store statistics
-            store.increment_sales(item_data['total'])
+        except CheckoutError as e:
+            raise serializers.ValidationError(str(e))
 
         return order
 
@@ -560,8 +602,53 @@ class OrderSerializer(serializers.ModelSerializer):
         return instance
 
 
+def get_cart_item_errors(items):
+    """
+    Check the products and stores referenced by cart items with two $in queries in total.
+    Returns {index: {field: [message]}} for the items that fail.
+    """
+    def object_ids(values):
+        ids = set()
+        for value in values:
+            try:
+                ids.add(ObjectId(value))
+            except (InvalidId, TypeError):
+                pass
+        return ids
+
+    products = {
+        str(pk): stock
+        for pk, stock in Product.objects.filter(
+            id__in=object_ids(item.get('product_id') for item in items), status='active'
+        ).values_list('id', 'stock')
+    }
+    stores = {
+        str(pk)
+        for pk in StoreOwner.objects.filter(
+            id__in=object_ids(item.get('owner_store_id') for item in items)
+        ).values_list('id', flat=True)
+    }
+
+    errors = {}
+    for index, item in enumerate(items):
+        item_errors = {}
+        product_id = str(item.get('product_id'))
+        if product_id not in products:
+            item_errors['product_id'] = ["محصول یافت نشد"]
+        elif products[product_id] <= 0:
+            item_errors['product_id'] = ["محصول موجود نیست"]
+        if str(item.get('owner_store_id')) not in stores:
+            item_errors['owner_store_id'] = ["فروشگاه یافت نشد"]
+        if item_errors:
+            errors[index] = item_errors
+    return errors
+
+
 class CartItemSerializer(serializers.Serializer):
-    """Serializer for individual cart items"""
+    """
+    Serializer for individual cart items. Product and store references are checked in
+    validate(); CartSerializer passes resolve_references=False and checks all items at once.
+    """
     product_id = serializers.CharField(required=True)
     quantity = serializers.IntegerField(min_value=1, default=1)
     price_snapshot = serializers.DecimalField(max_digits=10, decimal_places=2, required=True)
@@ -569,23 +656,17 @@ class CartItemSerializer(serializers.Serializer):
     size = serializers.CharField(max_length=50, default="", required=False)
     owner_store_id = serializers.CharField(required=True)
 
-    def validate_product_id(self, value):
-        """Validate product exists and is active"""
-        try:
-            product = Product.objects.get(id=value, status='active')
-            if not product.is_in_stock:
-                raise serializers.ValidationError("محصول موجود نیست")
-        except Product.DoesNotExist:
-            raise serializers.ValidationError("محصول یافت نشد")
-        return value
+    def __init__(self, *args, resolve_references=True, **kwargs):
+        self.resolve_references = resolve_references
+        super().__init__(*args, **kwargs)
 
-    def validate_owner_store_id(self, value):
-        """Validate store exists"""
-        try:
-            StoreOwner.objects.get(id=value)
-        except StoreOwner.DoesNotExist:
-            raise serializers.ValidationError("فروشگاه یافت نشد")
-        return value
+    def validate(self, attrs):
+        """Validate the product exists, is active and in stock, and the store exists"""
+        if self.resolve_references and not self.partial:
+            errors = get_cart_item_errors([attrs])
+            if errors:
+                raise serializers.ValidationError(errors[0])
+        return attrs
 
     def validate_price_snapshot(self, value):
         """Convert Decimal to float for MongoDB compatibility"""
@@ -611,7 +692,7 @@ class CartSerializer(serializers.ModelSerializer):
     # Force ObjectId to string for DRF representation
     id = serializers.SerializerMethodField(read_only=True)
     user_id = serializers.SerializerMethodField(read_only=True)
-    items = serializers.ListField(child=CartItemSerializer(), default=list)
+    items = serializers.ListField(child=CartItemSerializer(resolve_references=False), default=list)
 
     # Computed fields
     total_items = serializers.SerializerMethodField()
@@ -672,11 +753,10 @@ class CartSerializer(serializers.ModelSerializer):
         if len(product_ids) != len(set(product_ids)):
             raise serializers.ValidationError("محصولات تکراری در سبد خرید مجاز نیستند")
 
-        # Validate each item
-        for item in value:
-            item_serializer = CartItemSerializer(data=item)
-            if not item_serializer.is_valid():
-                raise serializers.ValidationError(item_serializer.errors)
+        # Item fields were validated by the child serializer; resolve all references in one pass
+        errors = get_cart_item_errors(value)
+        if errors:
+            raise serializers.ValidationError(errors)
 
         return value
 
@@ -702,9 +782,8 @@ class CartSerializer(serializers.ModelSerializer):
         if not hasattr(user, 'user_type') or user.user_type != 'customer':
             raise serializers.ValidationError("فقط مشتریان می‌توانند سبد خرید داشته باشند")
 
-        try:
-            customer = Customer.objects.get(id=user.id)
-        except Customer.DoesNotExist:
+        customer = resolve_user(request, Customer)
+        if customer is None:
             raise serializers.ValidationError("مشتری یافت نشد")
 
         # Use get_or_create for cart
@@ -713,7 +792,7 @@ class CartSerializer(serializers.ModelSerializer):
             # Update existing cart items if provided
             if 'items' in validated_data:
                 cart.items = validated_data['items']
-                cart.save()
+                cart.save(update_fields=['items', 'updated_at'])
 
         return cart
 
@@ -721,11 +800,11 @@ class CartSerializer(serializers.ModelSerializer):
         """Update cart items"""
         if 'items' in validated_data:
             instance.items = validated_data['items']
-            instance.save()
+            instance.save(update_fields=['items', 'updated_at'])
         return instance
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for Product model"""
     # Force ObjectId to string for DRF representation
     id = serializers.SerializerMethodField(read_only=True)
@@ -770,6 +849,7 @@ class ProductSerializer(serializers.ModelSerializer):
             'store_owner',
             'views',
             'sales_count',
+            'rating',
             'created_at',
             'updated_at',
             'is_in_stock',
@@ -778,10 +858,26 @@ class ProductSerializer(serializers.ModelSerializer):
             'images_count',
         ]
 
+    # ?view=card is served from the card snapshot by ProductCardSerializer
+    field_sources = {
+        'is_in_stock': ('stock',),
+        'is_low_stock': ('stock',),
+        'discount_percentage': ('price', 'compare_price'),
+        'images': ('id',),
+        'images_count': ('id',),
+    }
+
     def get_id(self, obj):
         return str(obj.id) if obj.id is not None else None
+
+    def _get_ordered_images(self, obj):
+        """Return images primary-first, reusing the prefetched list when available"""
+        if 'images' in getattr(obj, '_prefetched_objects_cache', {}):
+            return obj.images.all()
+        return obj.images.all().order_by('-is_primary', 'created_at')
+
     def get_images(self, obj):
-        images = obj.images.all().order_by('-is_primary', 'created_at')
+        images = self._get_ordered_images(obj)
         return ProductImageSerializer(images, many=True, context=self.context).data
 
     def get_store_owner(self, obj):
@@ -794,27 +890,25 @@ class ProductSerializer(serializers.ModelSerializer):
 
     def get_images_count(self, obj):
         """Return number of images"""
+        if 'images' in getattr(obj, '_prefetched_objects_cache', {}):
+            return len(obj.images.all())
         return obj.images.count()
 
     def validate_sku(self, value):
         """Validate SKU uniqueness per store owner"""
+        if not value or len(value.strip()) == 0:
+            raise serializers.ValidationError("کد محصول الزامی است")
+
         request = self.context.get('request')
         if request and hasattr(request, 'user'):
             user = request.user
             if hasattr(user, 'user_type') and user.user_type == 'store_owner':
-                # Check uniqueness for create or update
-                try:
-                    store_owner = StoreOwner.objects.get(id=user.id)
-                    query = Product.objects.filter(store_owner=store_owner, sku=value)
-                    if self.instance:
-                        query = query.exclude(id=self.instance.id)
-                    if query.exists():
-                        raise serializers.ValidationError("این کد محصول قبلاً برای این فروشگاه استفاده شده است")
-                except StoreOwner.DoesNotExist:
-                    pass  # If store owner not found, skip uniqueness check
-
-        if not value or len(value.strip()) == 0:
-            raise serializers.ValidationError("کد محصول الزامی است")
+                # Check uniqueness for create or update with one indexed equality on the normalized SKU
+                query = Product.objects.filter(store_owner_id=user.id, sku_normalized=normalize_sku(value))
+                if self.instance:
+                    query = query.exclude(id=self.instance.id)
+                if query.exists():
+                    raise serializers.ValidationError("این کد محصول قبلاً برای این فروشگاه استفاده شده است")
 
         return value.strip()
 
@@ -866,19 +960,6 @@ class ProductSerializer(serializers.ModelSerializer):
                     raise serializers.ValidationError("هر برچسب باید یک رشته باشد")
         return value
 
-    def validate_rating(self, value):
-        """Validate rating structure"""
-        if value and not isinstance(value, dict):
-            raise serializers.ValidationError("امتیاز باید یک شیء باشد")
-
-        if value:
-            if 'average' in value and (value['average'] < 0 or value['average'] > 5):
-                raise serializers.ValidationError("میانگین امتیاز باید بین 0 تا 5 باشد")
-            if 'count' in value and value['count'] < 0:
-                raise serializers.ValidationError("تعداد امتیازها نمی‌تواند منفی باشد")
-
-        return value
-
     def create(self, validated_data):
         """Create a new product"""
         # Get store owner from context
@@ -891,9 +972,8 @@ class ProductSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("فقط صاحبان فروشگاه می‌توانند محصول ایجاد کنند")
 
         # Get the StoreOwner instance
-        try:
-            store_owner = StoreOwner.objects.get(id=user.id)
-        except StoreOwner.DoesNotExist:
+        store_owner = resolve_user(request, StoreOwner)
+        if store_owner is None:
             raise serializers.ValidationError("فروشگاه یافت نشد")
 
         # Set store owner
@@ -909,7 +989,7 @@ class ProductSerializer(serializers.ModelSerializer):
         for field in [
             'title', 'description', 'sku', 'price', 'compare_price',
             'stock', 'category', 'sizes', 'colors', 'tags',
-            'status', 'rating'
+            'status'
         ]:
             if field in validated_data:
                 setattr(instance, field, validated_data[field])
@@ -918,6 +998,23 @@ class ProductSerializer(serializers.ModelSerializer):
         return instance
 
 
+class ProductCardSerializer(serializers.BaseSerializer):
+    """Read-only serializer for the denormalized product card used on listing pages"""
+
+    def to_representation(self, obj):
+        card = obj.card or {}
+        return {
+            'id': str(obj.id),
+            'title': card.get('title'),
+            'price': card.get('price'),
+            'compare_price': card.get('compare_price'),
+            'primary_image': card.get('primary_image'),
+            'images_count': card.get('images_count', 0),
+            'store_name': card.get('store_name'),
+            'rating': card.get('rating', {'average': 0, 'count': 0}),
+        }
+
+
 class ProductRatingSerializer(serializers.ModelSerializer):
     """Serializer for ProductRating model"""
     # Force ObjectId to string for DRF representation
@@ -995,9 +1092,8 @@ class ProductRatingSerializer(serializers.ModelSerializer):
         except Product.DoesNotExist:
             raise serializers.ValidationError("محصول یافت نشد")
 
-        try:
-            customer = Customer.objects.get(id=user.id)
-        except Customer.DoesNotExist:
+        customer = resolve_user(request, Customer)
+        if customer is None:
             raise serializers.ValidationError("مشتری یافت نشد")
 
         # Set customer and product
@@ -1006,10 +1102,8 @@ class ProductRatingSerializer(serializers.ModelSerializer):
 
         # Create rating - this will handle the unique constraint
         try:
-            rating = ProductRating.objects.create(**validated_data)
-            # Update product's aggregate rating
-            product.update_rating()
-            return rating
+            # Saving the rating applies it to the product's aggregate
+            return ProductRating.objects.create(**validated_data)
         except Exception as e:
             if 'unique_customer_product_rating' in str(e):
                 raise serializers.ValidationError("شما قبلاً به این محصول امتیاز داده‌اید")
@@ -1020,9 +1114,8 @@ class ProductRatingSerializer(serializers.ModelSerializer):
         # Only allow updating rating value
         if 'rating' in validated_data:
             instance.rating = validated_data['rating']
+            # Saving applies the difference to the product's aggregate
             instance.save()
-            # Update product's aggregate rating
-            instance.product.update_rating()
         return instance
 
 
@@ -1030,10 +1123,13 @@ class ProductRatingSerializer(serializers.ModelSerializer):
 UserSerializer = CustomerSerializer
 
 
-class StoreOwnerSerializer(serializers.ModelSerializer):
+class StoreOwnerSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for StoreOwner model"""
     # Force ObjectId to string for DRF representation
     id = serializers.SerializerMethodField(read_only=True)
+    # Ratings change only through rate-seller/rate-store and are shown as {average, count}
+    seller_rating = serializers.SerializerMethodField()
+    store_rating = serializers.SerializerMethodField()
     full_name = serializers.ReadOnlyField()
     has_profile_image = serializers.SerializerMethodField()
     profile_image_info = serializers.SerializerMethodField()
@@ -1104,9 +1200,26 @@ class StoreOwnerSerializer(serializers.ModelSerializer):
             'total_revenue',
         ]
 
+    field_views = {
+        'card': ('id', 'store_name', 'store_description', 'store_rating', 'has_store_logo', 'store_logo_info'),
+    }
+    field_sources = {
+        'full_name': ('first_name', 'last_name'),
+        'has_profile_image': ('image',),
+        'profile_image_info': ('image',),
+        'has_store_logo': ('store_logo',),
+        'store_logo_info': ('store_logo',),
+    }
+
     def get_id(self, obj):
         return str(obj.id) if obj.id is not None else None
 
+    def get_seller_rating(self, obj):
+        return obj.seller_rating_summary
+
+    def get_store_rating(self, obj):
+        return obj.store_rating_summary
+
     def get_has_profile_image(self, obj):
         return obj.has_profile_image()
 
@@ -1124,15 +1237,13 @@ class StoreOwnerSerializer(serializers.ModelSerializer):
         if not value or len(value.strip()) < 2:
             raise serializers.ValidationError("نام فروشگاه باید حداقل 2 کاراکتر باشد")
         
-        # Check uniqueness for create or update
+        # Check uniqueness for create or update on the normalized name
+        query = StoreOwner.objects.filter(store_name_normalized=normalize_text(value))
         if self.instance:
             # Update case - exclude current instance
-            if StoreOwner.objects.exclude(id=self.instance.id).filter(store_name=value).exists():
-                raise serializers.ValidationError("این نام فروشگاه قبلاً استفاده شده است")
-        else:
-            # Create case
-            if StoreOwner.objects.filter(store_name=value).exists():
-                raise serializers.ValidationError("این نام فروشگاه قبلاً استفاده شده است")
+            query = query.exclude(id=self.instance.id)
+        if query.exists():
+            raise serializers.ValidationError("این نام فروشگاه قبلاً استفاده شده است")
         
         return value.strip()
 
@@ -1148,6 +1259,9 @@ class StoreOwnerSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("تاریخ تاسیس فروشگاه نمی‌تواند در آینده باشد")
         return value
 
+    def to_internal_value(self, data):
+        return super().to_internal_value(normalize_phone_input(data))
+
     def validate_phone(self, value):
         """Validate phone number format and uniqueness"""
         # Check uniqueness for create or update
@@ -1177,32 +1291,6 @@ class StoreOwnerSerializer(serializers.ModelSerializer):
         
         return value
 
-    def validate_seller_rating(self, value):
-        """Validate seller rating structure"""
-        if value and not isinstance(value, dict):
-            raise serializers.ValidationError("امتیاز فروشنده باید یک شیء باشد")
-        
-        if value:
-            if 'average' in value and (value['average'] < 0 or value['average'] > 5):
-                raise serializers.ValidationError("میانگین امتیاز باید بین 0 تا 5 باشد")
-            if 'count' in value and value['count'] < 0:
-                raise serializers.ValidationError("تعداد امتیازها نمی‌تواند منفی باشد")
-        
-        return value
-
-    def validate_store_rating(self, value):
-        """Validate store rating structure"""
-        if value and not isinstance(value, dict):
-            raise serializers.ValidationError("امتیاز فروشگاه باید یک شیء باشد")
-        
-        if value:
-            if 'average' in value and (value['average'] < 0 or value['average'] > 5):
-                raise serializers.ValidationError("میانگین امتیاز باید بین 0 تا 5 باشد")
-            if 'count' in value and value['count'] < 0:
-                raise serializers.ValidationError("تعداد امتیازها نمی‌تواند منفی باشد")
-        
-        return value
-
     def create(self, validated_data):
         """Create a new store owner with password hashing"""
         password = self.initial_data.get('password')
@@ -1228,7 +1316,6 @@ class StoreOwnerSerializer(serializers.ModelSerializer):
             seller_bio=validated_data.get('seller_bio', ''),
             seller_social_links=validated_data.get('seller_social_links', {}),
             seller_status=validated_data.get('seller_status', StoreOwner.SellerStatus.APPROVED),
-            seller_rating=validated_data.get('seller_rating', {"average": 0, "count": 0}),
             store_logo=validated_data.get('store_logo'),
             store_domain=validated_data.get('store_domain'),
             store_description=validated_data.get('store_description', ''),
@@ -1239,7 +1326,6 @@ class StoreOwnerSerializer(serializers.ModelSerializer):
             supported_currencies=validated_data.get('supported_currencies', ['IRR']),
             terms_and_conditions=validated_data.get('terms_and_conditions', ''),
             privacy_policy=validated_data.get('privacy_policy', ''),
-            store_rating=validated_data.get('store_rating', {"average": 0, "count": 0}),
             payment_settings=validated_data.get('payment_settings', {}),
         )
         
@@ -1249,6 +1335,8 @@ class StoreOwnerSerializer(serializers.ModelSerializer):
 
     def update(self, instance, validated_data):
         """Update store owner instance"""
+        old_store_name = instance.store_name
+
         # Update basic fields
         for field in [
             'first_name', 'last_name', 'email', 'phone', 'post_code',
@@ -1268,4 +1356,8 @@ class StoreOwnerSerializer(serializers.ModelSerializer):
             instance.set_password(password)
         
         instance.save()
+
+        # Keep product cards showing the current store name
+        if instance.store_name != old_store_name:
+            instance.sync_product_cards()
         return instance
@@ -1,3 +1,1204 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from pymongo.errors import OperationFailure
+from rest_framework.test import APIClient
+
+from . import decay, home
+from .checkout import CheckoutError, checkout_cart, place_order
+from .counters import ViewCounterBuffer
+from .mongo import get_collection
+from .search import INDEX_NOT_FOUND
+from .users import resolve_user
+from .models import BaseUser, Cart, Comment, Customer, StoreOwner, StoreRating, Product, ProductImage, Order, OrderItem
+
+
+class ProductListQueryCountTests(TestCase):
+    """Product listings must cost the same number of queries whatever the page size"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.store_owner = StoreOwner.objects.create_store_owner(
+            phone="09120000001",
+            password="StrongPass@123",
+            store_name="فروشگاه تست",
+            first_name="علی",
+            last_name="رضایی",
+        )
+        self.created = 0
+
+    def create_products(self, count):
+        for _ in range(count):
+            self.created += 1
+            product = Product.objects.create(
+                store_owner=self.store_owner,
+                title=f"محصول {self.created}",
+                description="توضیحات",
+                sku=f"SKU-{self.created}",
+                price=100000,
+                stock=10,
+                category=Product.Category.MEN,
+            )
+            ProductImage.objects.create(product=product, image=f"products/{self.created}-a.jpg", is_primary=True)
+            ProductImage.objects.create(product=product, image=f"products/{self.created}-b.jpg")
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_list_query_count_is_constant(self):
+        self.create_products(2)
+        small_page = self.count_queries("/api/products/")
+        self.create_products(18)
+        full_page = self.count_queries("/api/products/")
+        self.assertEqual(small_page, full_page)
+
+    def test_store_products_query_count_is_constant(self):
+        url = f"/api/products/store/{self.store_owner.id}/"
+        self.client.force_authenticate(self.store_owner)
+        self.create_products(2)
+        small_page = self.count_queries(url)
+        self.create_products(18)
+        full_page = self.count_queries(url)
+        self.assertEqual(small_page, full_page)
+
+
+class ProductSearchTests(TestCase):
+    """GET /api/products/search/ ranks active matches by text relevance and popularity"""
+
+    def setUp(self):
+        self.client = APIClient()
+        store_owner = StoreOwner.objects.create_store_owner(
+            phone="09120000101",
+            password="StrongPass@123",
+            store_name="فروشگاه جستجو",
+        )
+
+        def create(sku, title, description, **fields):
+            return Product.objects.create(
+                store_owner=store_owner, sku=sku, title=title, description=description,
+                price=10000, stock=5, category=Product.Category.MEN, **fields
+            )
+
+        self.title_match = create("SEARCH-1", "کفش ورزشی", "راحت")
+        self.description_match = create("SEARCH-2", "کتانی", "کفش سبک برای پیاده روی")
+        self.inactive = create("SEARCH-3", "کفش کفش", "کفش", status=Product.Status.INACTIVE)
+
+    def search(self, q):
+        return self.client.get("/api/products/search/", {"q": q})
+
+    def result_ids(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [product["id"] for product in response.data["results"]]
+
+    def test_title_matches_rank_first(self):
+        ids = self.result_ids(self.search("کفش"))
+        self.assertEqual(ids, [str(self.title_match.pk), str(self.description_match.pk)])
+
+    def test_popularity_breaks_equal_relevance(self):
+        Product.objects.filter(pk=self.title_match.pk).update(title="کتانی", description="کفش سبک برای پیاده روی")
+        Product.objects.filter(pk=self.description_match.pk).update(sales_count=500, views=5000)
+        call_command("rebuild_normalized_fields", stdout=StringIO())
+
+        ids = self.result_ids(self.search("کفش"))
+        self.assertEqual(ids, [str(self.description_match.pk), str(self.title_match.pk)])
+
+    def test_inactive_products_are_excluded(self):
+        self.assertNotIn(str(self.inactive.pk), self.result_ids(self.search("کفش")))
+
+    def test_empty_query_is_rejected(self):
+        self.assertEqual(self.search("  ").status_code, 400)
+
+    def test_missing_text_index_is_reported(self):
+        error = OperationFailure("text index required for $text query", code=INDEX_NOT_FOUND)
+        with mock.patch("marketplace.search.get_collection") as get_collection:
+            get_collection.return_value.aggregate.side_effect = error
+            response = self.search("کفش")
+        self.assertEqual(response.status_code, 503)
+
+
+class ConditionalRetrieveTests(TestCase):
+    """Detail endpoints answer a matching If-None-Match with 304 until the resource changes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.store_owner = StoreOwner.objects.create_store_owner(
+            phone="09120000201",
+            password="StrongPass@123",
+            store_name="فروشگاه شرطی",
+        )
+        self.customer = Customer.objects.create_user(phone="09330000201", password="StrongPass@123")
+        self.product = Product.objects.create(
+            store_owner=self.store_owner,
+            title="محصول شرطی",
+            description="توضیحات",
+            sku="ETAG-1",
+            price=10000,
+            stock=5,
+            category=Product.Category.MEN,
+        )
+
+    def assert_revalidates(self, url, change):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_product(self):
+        def change():
+            self.product.price = 12000
+            self.product.save()
+
+        self.assert_revalidates(f"/api/products/{self.product.pk}/", change)
+
+    def test_product_has_no_last_modified(self):
+        url = f"/api/products/{self.product.pk}/"
+        response = self.client.get(url)
+        self.assertNotIn("Last-Modified", response)
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT")
+        self.assertEqual(response.status_code, 200)
+
+    def test_store(self):
+        self.client.force_authenticate(self.store_owner)
+
+        self.assert_revalidates(
+            "/api/store-owners/me/",
+            lambda: StoreOwner.objects.get(pk=self.store_owner.pk).increment_sales(10000),
+        )
+
+    def test_cart(self):
+        self.client.force_authenticate(self.customer)
+        cart = Cart.objects.create(user_id=self.customer, items=[])
+
+        def change():
+            response = self.client.post(f"/api/carts/{cart.pk}/add-item/", {
+                "product_id": str(self.product.pk),
+                "quantity": 1,
+                "price_snapshot": "10000",
+                "owner_store_id": str(self.store_owner.pk),
+            }, format="json")
+            self.assertEqual(response.status_code, 200)
+
+        self.assert_revalidates(f"/api/carts/{cart.pk}/", change)
+
+
+class CatalogCacheTests(TestCase):
+    """Public catalog responses are cached until a write bumps one of their version scopes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.store_owner = StoreOwner.objects.create_store_owner(
+            phone="09120000301",
+            password="StrongPass@123",
+            store_name="فروشگاه کش",
+        )
+        self.product = self.create_product("CACHE-1", Product.Category.MEN)
+
+    def create_product(self, sku, category, store_owner=None):
+        return Product.objects.create(
+            store_owner=store_owner or self.store_owner,
+            title=f"محصول {sku}",
+            description="توضیحات",
+            sku=sku,
+            price=10000,
+            stock=5,
+            category=category,
+        )
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(context.captured_queries)
+
+    def titles(self, data):
+        return [product["title"] for product in data["results"]]
+
+    def test_anonymous_hit_is_served_from_cache(self):
+        self.get("/api/products/")
+        # Raw writes bump nothing: the cached page is still served, without a query
+        Product.objects.filter(pk=self.product.pk).update(title="دور زدن کش")
+        data, queries = self.get("/api/products/")
+        self.assertEqual(queries, 0)
+        self.assertEqual(self.titles(data), [self.product.title])
+
+    def test_product_write_invalidates(self):
+        self.get("/api/products/")
+        self.get(f"/api/products/{self.product.pk}/")
+
+        self.product.title = "عنوان جدید"
+        self.product.save()
+
+        data, _ = self.get("/api/products/")
+        self.assertEqual(self.titles(data), ["عنوان جدید"])
+        data, _ = self.get(f"/api/products/{self.product.pk}/")
+        self.assertEqual(data["title"], "عنوان جدید")
+
+    def test_store_write_invalidates(self):
+        url = f"/api/products/{self.product.pk}/"
+        self.get(url)
+
+        self.store_owner.store_name = "نام جدید فروشگاه"
+        self.store_owner.save()
+
+        data, _ = self.get(url)
+        self.assertEqual(data["store_owner"]["store_name"], "نام جدید فروشگاه")
+
+    def test_category_write_invalidates(self):
+        url = "/api/categories/women/stores/"
+        data, _ = self.get(url)
+        self.assertEqual(data["total_stores"], 0)
+
+        self.create_product("CACHE-2", Product.Category.WOMEN)
+
+        data, _ = self.get(url)
+        self.assertEqual(data["total_stores"], 1)
+
+    def test_private_requests_bypass_the_cache(self):
+        self.client.force_authenticate(self.store_owner)
+        self.get("/api/products/")
+        Product.objects.filter(pk=self.product.pk).update(title="دور زدن کش")
+
+        data, queries = self.get("/api/products/")
+        self.assertGreater(queries, 0)
+        self.assertEqual(self.titles(data), ["دور زدن کش"])
+
+
+class ProductFacetsTests(TestCase):
+    """Facet counts honour every filter except their own dimension"""
+
+    def setUp(self):
+        self.client = APIClient()
+        store_owner = StoreOwner.objects.create_store_owner(
+            phone="09120000401",
+            password="StrongPass@123",
+            store_name="فروشگاه فیلتر",
+        )
+        rows = [
+            (Product.Category.MEN, 10000, 5, ["M"], Product.Status.ACTIVE),
+            (Product.Category.MEN, 30000, 5, ["L"], Product.Status.ACTIVE),
+            (Product.Category.WOMEN, 20000, 5, ["M"], Product.Status.ACTIVE),
+            (Product.Category.WOMEN, 50000, 0, ["S"], Product.Status.ACTIVE),
+            (Product.Category.MEN, 15000, 5, ["M"], Product.Status.INACTIVE),
+        ]
+        for index, (category, price, stock, sizes, product_status) in enumerate(rows):
+            Product.objects.create(
+                store_owner=store_owner,
+                title=f"محصول فیلتر {index}",
+                description="توضیحات",
+                sku=f"FACET-{index}",
+                price=price,
+                stock=stock,
+                sizes=sizes,
+                category=category,
+                status=product_status,
+            )
+
+    def facets(self, **params):
+        response = self.client.get("/api/products/facets/", params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def counts(self, data, facet):
+        return {row["value"]: row["count"] for row in data["facets"][facet]}
+
+    def price_range(self, data):
+        price = data["facets"]["price"]
+        return Decimal(price["min"]), Decimal(price["max"])
+
+    def test_unfiltered(self):
+        data = self.facets()
+        self.assertEqual(data["total"], 4)
+        self.assertEqual(self.counts(data, "category"), {"men": 2, "women": 2})
+        self.assertEqual(self.counts(data, "sizes"), {"M": 2, "L": 1, "S": 1})
+        self.assertEqual(self.price_range(data), (10000, 50000))
+        self.assertEqual(data["facets"]["in_stock"], {"true": 3, "false": 1})
+
+    def test_selected_category_keeps_its_alternatives(self):
+        data = self.facets(category="men")
+        self.assertEqual(data["total"], 2)
+        self.assertEqual(len(data["results"]), 2)
+        # The category facet ignores the category filter; the others apply it
+        self.assertEqual(self.counts(data, "category"), {"men": 2, "women": 2})
+        self.assertEqual(self.counts(data, "sizes"), {"M": 1, "L": 1})
+        self.assertEqual(self.price_range(data), (10000, 30000))
+
+    def test_category_and_price_filters(self):
+        data = self.facets(category="men", max_price="20000")
+        self.assertEqual(data["total"], 1)
+        self.assertEqual(self.counts(data, "category"), {"men": 1, "women": 1})
+        self.assertEqual(self.price_range(data), (10000, 30000))
+        self.assertEqual(self.counts(data, "sizes"), {"M": 1})
+        self.assertEqual(data["facets"]["in_stock"], {"true": 1, "false": 0})
+
+
+class DecayScoreTests(TestCase):
+    """Stored log2 scores: older events weigh less, and adding events stays exact"""
+
+    def test_event_loses_half_its_weight_per_half_life(self):
+        now = timezone.now()
+        day_ago = now - timedelta(seconds=decay.half_life("trending"))
+        self.assertAlmostEqual(decay.log_score("trending", 1, at=day_ago), decay.log_score("trending", 1, at=now) - 1)
+        self.assertAlmostEqual(decay.current_score("trending", decay.log_score("trending", 8, at=day_ago), at=now), 4)
+        self.assertEqual(decay.current_score("trending", None), 0.0)
+
+    def test_add_expression_sums_decayed_weights(self):
+        now = timezone.now()
+        old = decay.log_score("best_sellers", 4, at=now - timedelta(seconds=decay.half_life("best_sellers")))
+        new = decay.log_score("best_sellers", 1, at=now)
+        store_owner = StoreOwner.objects.create_store_owner(
+            phone="09120000502",
+            password="StrongPass@123",
+            store_name="فروشگاه امتیاز کاهشی",
+        )
+        product = Product.objects.create(
+            store_owner=store_owner,
+            title="محصول کاهشی",
+            description="توضیحات",
+            sku="DECAY-1",
+            price=10000,
+            stock=5,
+            category=Product.Category.MEN,
+        )
+
+        for value in (old, new):
+            get_collection(Product).update_one({"_id": product.pk}, [{"$set": {
+                "best_seller_score": decay.add_expression("best_seller_score", value),
+            }}])
+
+        product.refresh_from_db(fields=["best_seller_score"])
+        # 4 units one half-life ago count as 2, plus 1 unit now
+        self.assertAlmostEqual(decay.current_score("best_sellers", product.best_seller_score, at=now), 3, places=6)
+
+
+class ProductRankingTests(TestCase):
+    """Trending and best-seller endpoints order active products by decayed score"""
+
+    def setUp(self):
+        self.client = APIClient()
+        store_owner = StoreOwner.objects.create_store_owner(
+            phone="09120000501",
+            password="StrongPass@123",
+            store_name="فروشگاه رتبه",
+        )
+        self.products = [
+            Product.objects.create(
+                store_owner=store_owner,
+                title=f"محصول رتبه {index}",
+                description="توضیحات",
+                sku=f"RANK-{index}",
+                price=10000,
+                stock=100,
+                category=Product.Category.MEN,
+            )
+            for index in range(3)
+        ]
+
+    def ranked_ids(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [product["id"] for product in response.data["results"]]
+
+    def test_recent_sales_outrank_older_bigger_ones(self):
+        old, recent, inactive = self.products
+        three_half_lives_ago = timezone.now() - timedelta(seconds=3 * decay.half_life("best_sellers"))
+        # 10 units three half-lives ago decay to 1.25, below 2 units sold now
+        Product.objects.filter(pk=old.pk).update(best_seller_score=decay.log_score("best_sellers", 10, at=three_half_lives_ago))
+        Product.objects.filter(pk=recent.pk).update(best_seller_score=decay.log_score("best_sellers", 2))
+        Product.objects.filter(pk=inactive.pk).update(
+            best_seller_score=decay.log_score("best_sellers", 50), status=Product.Status.INACTIVE
+        )
+
+        self.assertEqual(self.ranked_ids("/api/products/best-sellers/"), [str(recent.pk), str(old.pk)])
+
+    def test_trending_follows_sales_and_views(self):
+        viewed, sold, idle = self.products
+        sold.increment_sales(2)
+        Product.objects.filter(pk=viewed.pk).update(trending_score=decay.log_score("trending", decay.trending_weight("view")))
+
+        ids = self.ranked_ids("/api/products/trending/?category=men")
+        self.assertEqual(ids, [str(sold.pk), str(viewed.pk)])
+        self.assertNotIn(str(idle.pk), ids)
+
+
+class HomeTests(TestCase):
+    """GET /api/home/ composes every section, and one failing section leaves the rest intact"""
+
+    def setUp(self):
+        self.client = APIClient()
+        store_owner = StoreOwner.objects.create_store_owner(
+            phone="09120000601",
+            password="StrongPass@123",
+            store_name="فروشگاه خانه",
+        )
+        self.product = Product.objects.create(
+            store_owner=store_owner,
+            title="محصول خانه",
+            description="توضیحات",
+            sku="HOME-1",
+            price=10000,
+            stock=5,
+            category=Product.Category.KIDS,
+        )
+
+    def get_home(self):
+        response = self.client.get("/api/home/")
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_sections(self):
+        data = self.get_home()
+
+        self.assertEqual(set(data), set(home.HOME_SECTIONS))
+        categories = {row["value"]: row["active_products"] for row in data["categories"]}
+        self.assertEqual(categories, {"men": 0, "women": 0, "kids": 1, "baby": 0})
+        self.assertEqual(set(data["stores"]), set(Product.Category.values))
+        self.assertEqual([store["store_name"] for store in data["stores"]["kids"]], ["فروشگاه خانه"])
+        self.assertEqual([product["id"] for product in data["latest"]], [str(self.product.pk)])
+        self.assertEqual(data["featured"], [])
+
+    def test_failing_section_does_not_break_the_page(self):
+        def fail():
+            raise RuntimeError("section down")
+
+        sections = {**home.HOME_SECTIONS, "latest": (fail, home.HOME_SECTIONS["latest"][1])}
+        with mock.patch.dict(home.HOME_SECTIONS, sections), self.assertLogs("marketplace.home", "ERROR"):
+            data = self.get_home()
+
+        self.assertIsNone(data["latest"])
+        self.assertEqual(len(data["categories"]), len(Product.Category.values))
+        self.assertIn("kids", data["stores"])
+
+
+class StoresByCategoryQueryCountTests(TestCase):
+    """Stores by category is a single aggregation whatever the number of stores"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.stores = 0
+
+    def create_stores(self, count):
+        for _ in range(count):
+            self.stores += 1
+            store_owner = StoreOwner.objects.create_store_owner(
+                phone=f"0912{self.stores:07d}",
+                password="StrongPass@123",
+                store_name=f"فروشگاه {self.stores}",
+                first_name="علی",
+                last_name="رضایی",
+            )
+            for number in range(self.stores % 3 + 1):
+                Product.objects.create(
+                    store_owner=store_owner,
+                    title=f"محصول {number}",
+                    description="توضیحات",
+                    sku=f"SKU-{self.stores}-{number}",
+                    price=100000,
+                    stock=10,
+                    category=Product.Category.WOMEN,
+                )
+
+    def fetch(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(context.captured_queries)
+
+    def test_query_count_is_constant(self):
+        url = "/api/categories/women/stores/?page_size=100"
+        self.create_stores(2)
+        few, few_queries = self.fetch(url)
+        self.create_stores(30)
+        many, many_queries = self.fetch(url)
+        self.assertEqual(few_queries, many_queries)
+        self.assertEqual(many["total_stores"], 32)
+        counts = [store["products_count"] for store in many["stores"]]
+        self.assertEqual(counts, sorted(counts, reverse=True))
+
+
+class OrderListQueryCountTests(TestCase):
+    """Order listings batch users, stores, item counts and (with ?include=items) items per page"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.store_owner = StoreOwner.objects.create_store_owner(
+            phone="09150000001",
+            password="StrongPass@123",
+            store_name="فروشگاه سفارش",
+        )
+        self.customer = Customer.objects.create_user(phone="09370000001", password="StrongPass@123")
+        self.product = Product.objects.create(
+            store_owner=self.store_owner,
+            title="محصول سفارش",
+            description="توضیحات",
+            sku="ORDER-1",
+            price=100000,
+            stock=1000,
+            category=Product.Category.MEN,
+        )
+
+    def create_orders(self, count):
+        for _ in range(count):
+            order = Order.objects.create(
+                user=self.customer,
+                store=self.store_owner,
+                total_amount=200000,
+                payment_method="cash",
+            )
+            for _ in range(2):
+                OrderItem.objects.create(order=order, product=self.product, title="محصول سفارش", price=100000, quantity=1)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(context.captured_queries)
+
+    def assert_constant(self, url):
+        self.create_orders(2)
+        _, small_page = self.count_queries(url)
+        self.create_orders(18)
+        data, full_page = self.count_queries(url)
+        self.assertEqual(small_page, full_page)
+        return data
+
+    def test_customer_orders_query_count_is_constant(self):
+        self.client.force_authenticate(self.customer)
+        data = self.assert_constant("/api/orders/my-orders/")
+        self.assertNotIn("items", data["results"][0])
+        self.assertEqual(data["results"][0]["items_count"], 2)
+
+    def test_store_orders_with_items_query_count_is_constant(self):
+        self.client.force_authenticate(self.store_owner)
+        data = self.assert_constant("/api/orders/store-orders/?include=items")
+        self.assertEqual(len(data["results"][0]["items"]), 2)
+
+
+class StoreCountersTests(TestCase):
+    """Store counters are written with raw $inc/$set updates and must land on the store row"""
+
+    def setUp(self):
+        self.store_owner = StoreOwner.objects.create_store_owner(
+            phone="09150000001",
+            password="StrongPass@123",
+            store_name="فروشگاه شمارنده",
+        )
+        customer = Customer.objects.create_user(phone="09370000001", password="StrongPass@123")
+        self.product = Product.objects.create(
+            store_owner=self.store_owner,
+            title="محصول شمارنده",
+            description="توضیحات",
+            sku="COUNTER-1",
+            price=30000,
+            stock=10,
+            category=Product.Category.MEN,
+        )
+        self.order = Order.objects.create(user=customer, store=self.store_owner, total_amount=60000)
+        OrderItem.objects.create(
+            order=self.order, product=self.product, title=self.product.title, price=30000, quantity=2, total=60000
+        )
+
+    def reload(self):
+        return StoreOwner.objects.get(pk=self.store_owner.pk)
+
+    def test_increments_reach_the_store(self):
+        store = self.reload()
+        self.assertEqual(store.active_products_count, 1)
+
+        store.increment_sales(60000)
+        store = self.reload()
+        self.assertEqual(store.total_sales, 1)
+        self.assertEqual(store.total_revenue, 60000)
+
+    def test_reconcile_rebuilds_counters(self):
+        StoreOwner.objects.filter(pk=self.store_owner.pk).update(
+            active_products_count=7, total_sales=7, total_revenue=7
+        )
+        call_command("reconcile_store_stats", stdout=StringIO())
+
+        store = self.reload()
+        self.assertEqual(store.active_products_count, 1)
+        self.assertEqual(store.total_sales, 1)
+        self.assertEqual(store.total_revenue, 60000)
+
+
+class ProductSalesCountTests(TestCase):
+    """Orders record sales with $inc; a later save of a stale product must not undo them"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.store_owner = StoreOwner.objects.create_store_owner(
+            phone="09180000001",
+            password="StrongPass@123",
+            store_name="فروشگاه فروش",
+        )
+        self.customer = Customer.objects.create_user(phone="09310000001", password="StrongPass@123")
+        self.product = Product.objects.create(
+            store_owner=self.store_owner,
+            title="محصول فروش",
+            description="توضیحات",
+            sku="SALES-1",
+            price=20000,
+            stock=10,
+            category=Product.Category.MEN,
+        )
+
+    def test_order_records_sales_that_survive_a_stale_save(self):
+        self.client.force_authenticate(self.customer)
+        response = self.client.post("/api/orders/", {
+            "payment_method": "cash",
+            "cart_items": [{"product_id": str(self.product.pk), "quantity": 3}],
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+
+        # self.product was loaded before the order: saving it must keep the recorded sales
+        self.product.title = "محصول فروش ویرایش شده"
+        self.product.save()
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.sales_count, 3)
+
+
+class ProductRatingTests(TestCase):
+    """The rating aggregate only changes through ProductRating rows, never from client input"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.store_owner = StoreOwner.objects.create_store_owner(
+            phone="09180000002",
+            password="StrongPass@123",
+            store_name="فروشگاه امتیاز محصول",
+        )
+        self.customer = Customer.objects.create_user(phone="09310000002", password="StrongPass@123")
+        self.product = Product.objects.create(
+            store_owner=self.store_owner,
+            title="محصول امتیاز",
+            description="توضیحات",
+            sku="RATING-1",
+            price=20000,
+            stock=10,
+            category=Product.Category.MEN,
+        )
+
+    def test_client_rating_is_ignored(self):
+        self.client.force_authenticate(self.store_owner)
+        response = self.client.patch(f"/api/products/{self.product.pk}/", {
+            "title": "محصول امتیاز جدید",
+            "rating": {"average": 5, "count": 999},
+        }, format="json")
+        self.assertEqual(response.status_code, 200)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.title, "محصول امتیاز جدید")
+        self.assertEqual(self.product.rating["count"], 0)
+        self.assertEqual(self.product.card["title"], "محصول امتیاز جدید")
+        self.assertEqual(self.product.card["rating"], {"average": 0, "count": 0})
+
+    def test_card_rating_follows_stored_aggregate(self):
+        self.product.add_rating(self.customer, 4)
+
+        # An unsaved in-memory rating never reaches the card
+        self.product.rating = {"average": 5, "count": 999}
+        self.product.title = "محصول امتیاز ویرایش شده"
+        self.product.save()
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating["count"], 1)
+        self.assertEqual(self.product.card["rating"], {"average": 4.0, "count": 1})
+
+
+class CommentPaginationTests(TestCase):
+    """Cursor paging walks product comments newest first, each row exactly once"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.store_owner = StoreOwner.objects.create_store_owner(
+            phone="09180000003",
+            password="StrongPass@123",
+            store_name="فروشگاه نظرات",
+        )
+        self.customer = Customer.objects.create_user(phone="09310000003", password="StrongPass@123")
+        self.product = Product.objects.create(
+            store_owner=self.store_owner,
+            title="محصول نظرات",
+            description="توضیحات",
+            sku="COMMENTS-1",
+            price=20000,
+            stock=10,
+            category=Product.Category.MEN,
+        )
+        comments = [
+            Comment.objects.create(product=self.product, author=self.customer, content=f"نظر {i}")
+            for i in range(7)
+        ]
+        # Shared timestamps force the id tie-breaker across page boundaries
+        now = timezone.now()
+        for i, comment in enumerate(comments):
+            Comment.objects.filter(pk=comment.pk).update(created_at=now - timedelta(minutes=i // 3))
+        Comment.objects.create(
+            product=self.product, author=self.store_owner, content="پاسخ", parent=comments[0]
+        )
+        self.expected = [
+            str(pk) for pk in Comment.objects.filter(
+                product=self.product, parent__isnull=True
+            ).values_list("pk", flat=True)
+        ]
+
+    def test_default_ordering_is_newest_first(self):
+        rows = list(Comment.objects.filter(product=self.product, parent__isnull=True))
+        keys = [(c.created_at, str(c.pk)) for c in rows]
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(keys, sorted(keys, reverse=True))
+
+    def test_cursor_pages_return_each_comment_once(self):
+        self.client.force_authenticate(self.customer)
+        url = f"/api/comments/product/{self.product.pk}/?page_size=2"
+        seen = []
+        pages = 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data["comments"]), 2)
+            seen.extend(str(c["id"]) for c in response.data["comments"])
+            url = response.data["next"]
+            pages += 1
+
+        self.assertEqual(pages, 4)
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(seen, self.expected)
+
+
+class ViewCounterBufferTests(SimpleTestCase):
+    """Buffered product views are written in one bulk_write and never by the request itself"""
+
+    def setUp(self):
+        self.buffer = ViewCounterBuffer(interval=3600, max_size=3)
+        # No background thread: the tests drive flush() themselves
+        patcher = mock.patch.object(ViewCounterBuffer, "_ensure_started")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch("marketplace.mongo.get_collection")
+        self.collection = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+
+    def test_flush_batches_into_one_bulk_write(self):
+        self.buffer.add("a")
+        self.buffer.add("a")
+        self.buffer.add("b")
+
+        self.assertEqual(self.buffer.flush(), 2)
+        self.collection.bulk_write.assert_called_once()
+        operations = self.collection.bulk_write.call_args.args[0]
+        self.assertEqual(len(operations), 2)
+        self.assertEqual(self.buffer.pending("a"), 0)
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_failed_flush_is_requeued(self):
+        self.buffer.add("a", 2)
+        self.collection.bulk_write.side_effect = Exception("database down")
+        with self.assertLogs("marketplace.counters", "ERROR"):
+            self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(self.buffer.pending("a"), 2)
+
+        self.collection.bulk_write.side_effect = None
+        self.buffer.add("a")
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(self.buffer.pending("a"), 0)
+
+    def test_max_size_wakes_the_flusher_and_caps_the_buffer(self):
+        for product_id in ("a", "b"):
+            self.buffer.add(product_id)
+        self.assertFalse(self.buffer._wakeup.is_set())
+
+        self.buffer.add("c")
+        self.assertTrue(self.buffer._wakeup.is_set())
+        self.collection.bulk_write.assert_not_called()
+
+        # Full: pending products keep counting, new ones are dropped
+        self.assertEqual(self.buffer.add("a"), 2)
+        self.assertEqual(self.buffer.add("d"), 0)
+        self.assertEqual(self.buffer.dropped, 1)
+
+    def test_failed_flush_backs_off(self):
+        for product_id in ("a", "b", "c"):
+            self.buffer.add(product_id)
+        self.buffer._wakeup.clear()
+        self.collection.bulk_write.side_effect = Exception("database down")
+        with self.assertLogs("marketplace.counters", "ERROR"):
+            self.buffer.flush()
+
+        self.buffer.add("a")
+        self.assertFalse(self.buffer._wakeup.is_set())
+        self.assertEqual(self.collection.bulk_write.call_count, 1)
+
+
+@override_settings(USER_CACHE_TIMEOUT=60)
+class ResolveUserTests(TestCase):
+    """The request's Customer row is loaded once per request and cached until the profile changes"""
+
+    def setUp(self):
+        self.customer = Customer.objects.create_user(phone="09340000001", password="StrongPass@123")
+
+    def request(self):
+        request = RequestFactory().get("/")
+        # Authentication yields the base user row, not the Customer child
+        request.user = BaseUser.objects.get(pk=self.customer.pk)
+        return request
+
+    def test_resolved_once_per_request(self):
+        request = self.request()
+        with CaptureQueriesContext(connection) as context:
+            first = resolve_user(request, Customer)
+            second = resolve_user(request)
+        self.assertIs(first, second)
+        self.assertEqual(first.pk, self.customer.pk)
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertIsNone(resolve_user(request, StoreOwner))
+
+    def test_cross_request_cache_is_invalidated_on_save(self):
+        resolve_user(self.request())
+        request = self.request()
+        with CaptureQueriesContext(connection) as context:
+            cached = resolve_user(request)
+        self.assertEqual(len(context.captured_queries), 0)
+        self.assertEqual(cached.pk, self.customer.pk)
+
+        self.customer.first_name = "سارا"
+        self.customer.save()
+
+        request = self.request()
+        with CaptureQueriesContext(connection) as context:
+            fresh = resolve_user(request)
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertEqual(fresh.first_name, "سارا")
+
+
+class StoreRatingConcurrencyTests(TransactionTestCase):
+    """Concurrent raters must never overwrite each other's seller/store ratings"""
+
+    raters = 24
+
+    def setUp(self):
+        self.store_owner = StoreOwner.objects.create_store_owner(
+            phone="09130000001",
+            password="StrongPass@123",
+            store_name="فروشگاه امتیاز",
+        )
+        self.customers = [
+            Customer.objects.create_user(phone=f"0935{number:07d}", password="StrongPass@123")
+            for number in range(self.raters)
+        ]
+
+    def rate_concurrently(self, ratings):
+        """Rate from a thread pool, each call on its own freshly loaded store instance"""
+        def rate(args):
+            customer, kind, value = args
+            try:
+                StoreOwner.objects.get(pk=self.store_owner.pk).rate(customer, kind, value)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(rate, ratings))
+        return StoreOwner.objects.get(pk=self.store_owner.pk)
+
+    def test_no_lost_updates(self):
+        ratings = [(customer, StoreRating.Kind.STORE, 1 + index % 5) for index, customer in enumerate(self.customers)]
+        ratings += [(customer, StoreRating.Kind.SELLER, 4) for customer in self.customers]
+        store = self.rate_concurrently(ratings)
+
+        expected_sum = sum(value for _, kind, value in ratings if kind == StoreRating.Kind.STORE)
+        self.assertEqual(store.store_rating["count"], self.raters)
+        self.assertAlmostEqual(store.store_rating["sum"], expected_sum)
+        self.assertEqual(store.seller_rating_summary, {"average": 4.0, "count": self.raters})
+
+    def test_repeat_ratings_replace_previous(self):
+        customer = self.customers[0]
+        ratings = [(customer, StoreRating.Kind.STORE, value) for value in (1, 2, 3, 4, 5) * 4]
+        store = self.rate_concurrently(ratings)
+
+        stored = StoreRating.objects.get(store=store, rater=customer, kind=StoreRating.Kind.STORE)
+        self.assertEqual(store.store_rating["count"], 1)
+        self.assertAlmostEqual(store.store_rating["sum"], float(stored.rating))
+
+
+class CheckoutConcurrencyTests(TransactionTestCase):
+    """Concurrent checkouts must never sell more than the stock on hand"""
+
+    buyers = 16
+
+    def setUp(self):
+        self.store_owner = StoreOwner.objects.create_store_owner(
+            phone="09140000001",
+            password="StrongPass@123",
+            store_name="فروشگاه موجودی",
+        )
+        self.customers = [
+            Customer.objects.create_user(phone=f"0936{number:07d}", password="StrongPass@123")
+            for number in range(self.buyers)
+        ]
+        self.products = [
+            Product.objects.create(
+                store_owner=self.store_owner,
+                title=f"محصول کمیاب {index}",
+                description="توضیحات",
+                sku=f"SCARCE-{index}",
+                price=50000,
+                stock=5,
+                category=Product.Category.MEN,
+            )
+            for index in range(2)
+        ]
+
+    def checkout_concurrently(self, lines):
+        """Every buyer checks out the same lines at once; returns the number of placed orders"""
+        def buy(customer):
+            try:
+                place_order(customer, lines, payment_method="cash")
+                return True
+            except CheckoutError:
+                return False
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            return sum(executor.map(buy, self.customers))
+
+    def test_no_oversell(self):
+        placed = self.checkout_concurrently([
+            {"product_id": str(product.pk), "quantity": 2} for product in self.products
+        ])
+
+        # 5 in stock, 2 per order: exactly two orders fit and the rest leave nothing behind
+        self.assertEqual(placed, 2)
+        for product in self.products:
+            product.refresh_from_db()
+            self.assertEqual(product.stock, 1)
+            self.assertEqual(product.sales_count, 4)
+        self.assertEqual(Order.objects.count(), placed)
+        self.assertEqual(OrderItem.objects.count(), placed * len(self.products))
+
+        store = StoreOwner.objects.get(pk=self.store_owner.pk)
+        self.assertEqual(store.total_sales, placed * len(self.products))
+        self.assertEqual(store.total_revenue, 50000 * 2 * len(self.products) * placed)
+
+    def test_single_unit_stock_goes_to_one_buyer(self):
+        product = self.products[0]
+        Product.objects.filter(pk=product.pk).update(stock=1)
+
+        placed = self.checkout_concurrently([{"product_id": str(product.pk), "quantity": 1}])
+
+        product.refresh_from_db()
+        self.assertEqual(placed, 1)
+        self.assertEqual(product.stock, 0)
+        self.assertEqual(OrderItem.objects.filter(product=product).count(), 1)
+
+
+class CartItemTests(TestCase):
+    """In-place cart line updates still validate the product behind the line"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.customer = Customer.objects.create_user(phone="09320000001", password="StrongPass@123")
+        self.client.force_authenticate(self.customer)
+        store_owner = StoreOwner.objects.create_store_owner(
+            phone="09190000001",
+            password="StrongPass@123",
+            store_name="فروشگاه سبد",
+        )
+        self.product = Product.objects.create(
+            store_owner=store_owner,
+            title="محصول سبد",
+            description="توضیحات",
+            sku="CART-1",
+            price=15000,
+            stock=5,
+            category=Product.Category.MEN,
+        )
+        self.cart = Cart.objects.create(user_id=self.customer, items=[{
+            "product_id": str(self.product.pk),
+            "quantity": 1,
+            "price_snapshot": 15000.0,
+            "owner_store_id": str(store_owner.pk),
+        }])
+
+    def update(self, **data):
+        url = f"/api/carts/{self.cart.pk}/update-item/{self.product.pk}/"
+        return self.client.patch(url, data, format="json")
+
+    def test_update_item(self):
+        response = self.update(quantity=3)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Cart.objects.get(pk=self.cart.pk).items[0]["quantity"], 3)
+
+    def test_update_item_rejects_inactive_product(self):
+        Product.objects.filter(pk=self.product.pk).update(status=Product.Status.INACTIVE)
+
+        response = self.update(quantity=3)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Cart.objects.get(pk=self.cart.pk).items[0]["quantity"], 1)
+
+
+class CartRefreshTests(TestCase):
+    """/api/carts/{id}/refresh/ reports price and stock changes since items were added"""
+
+    def setUp(self):
+        self.client = APIClient()
+        customer = Customer.objects.create_user(phone="09320000002", password="StrongPass@123")
+        self.client.force_authenticate(customer)
+        store_owner = StoreOwner.objects.create_store_owner(
+            phone="09190000002",
+            password="StrongPass@123",
+            store_name="فروشگاه بازبینی",
+        )
+        self.product = Product.objects.create(
+            store_owner=store_owner,
+            title="محصول بازبینی",
+            description="توضیحات",
+            sku="REFRESH-1",
+            price=15000,
+            stock=10,
+            category=Product.Category.MEN,
+        )
+        self.cart = Cart.objects.create(user_id=customer, items=[])
+        response = self.client.post(f"/api/carts/{self.cart.pk}/add-item/", {
+            "product_id": str(self.product.pk),
+            "quantity": 4,
+            "price_snapshot": "15000",
+            "owner_store_id": str(store_owner.pk),
+        }, format="json")
+        self.assertEqual(response.status_code, 200)
+
+        self.product.price = 18000
+        self.product.stock = 3
+        self.product.save()
+        self.url = f"/api/carts/{self.cart.pk}/refresh/"
+
+    def test_reports_price_and_stock_changes(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data["changed"])
+        self.assertFalse(response.data["persisted"])
+        [item] = response.data["items"]
+        self.assertEqual(item["issues"], ["price_changed", "insufficient_stock"])
+        self.assertEqual(Decimal(item["price_snapshot"]), 15000)
+        self.assertEqual(Decimal(item["current_price"]), 18000)
+        self.assertEqual(item["available_stock"], 3)
+        self.assertEqual(Decimal(response.data["snapshot_total"]), 15000 * 4)
+        # Only the units still in stock count at the current price
+        self.assertEqual(Decimal(response.data["current_total"]), 18000 * 3)
+        self.assertEqual(Cart.objects.get(pk=self.cart.pk).items[0]["price_snapshot"], 15000)
+
+    def test_post_saves_current_prices(self):
+        response = self.client.post(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data["persisted"])
+        self.assertEqual(Cart.objects.get(pk=self.cart.pk).items[0]["price_snapshot"], 18000)
+
+        [item] = self.client.get(self.url).data["items"]
+        self.assertEqual(item["issues"], ["insufficient_stock"])
+
+
+class CartCheckoutTests(TransactionTestCase):
+    """POST /api/orders/checkout/ splits the cart per store and takes the lines out of it"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.customer = Customer.objects.create_user(phone="09390000001", password="StrongPass@123")
+        self.client.force_authenticate(self.customer)
+        self.stores = [
+            StoreOwner.objects.create_store_owner(
+                phone=f"0917000000{index}",
+                password="StrongPass@123",
+                store_name=f"فروشگاه {index}",
+            )
+            for index in range(2)
+        ]
+        self.products = [
+            Product.objects.create(
+                store_owner=store,
+                title=f"محصول {index}",
+                description="توضیحات",
+                sku=f"CHECKOUT-{index}",
+                price=10000,
+                stock=5,
+                category=Product.Category.MEN,
+            )
+            for index, store in enumerate(self.stores * 2)
+        ]
+        self.cart = Cart.objects.create(user_id=self.customer, items=[
+            {
+                "product_id": str(product.pk),
+                "quantity": 2,
+                "price_snapshot": 10000.0,
+                "owner_store_id": str(product.store_owner_id),
+            }
+            for product in self.products
+        ])
+
+    def checkout(self, **data):
+        return self.client.post("/api/orders/checkout/", {"payment_method": "cash", **data}, format="json")
+
+    def cart_product_ids(self):
+        return [item["product_id"] for item in Cart.objects.get(pk=self.cart.pk).items]
+
+    def test_one_order_per_store(self):
+        response = self.checkout()
+
+        self.assertEqual(response.status_code, 201)
+        orders = response.data["data"]
+        self.assertEqual(sorted(order["store"]["id"] for order in orders), sorted(str(store.pk) for store in self.stores))
+        self.assertTrue(all(len(order["items"]) == 2 for order in orders))
+        self.assertEqual(self.cart_product_ids(), [])
+        for product in self.products:
+            product.refresh_from_db()
+            self.assertEqual(product.stock, 3)
+
+    def test_product_ids_limits_the_checkout(self):
+        chosen = self.products[0]
+        response = self.checkout(product_ids=[str(chosen.pk)])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data["data"]), 1)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(OrderItem.objects.get().product_id, chosen.pk)
+        self.assertEqual(sorted(self.cart_product_ids()), sorted(str(product.pk) for product in self.products[1:]))
+
+    def test_cart_cannot_be_checked_out_twice(self):
+        checkout_cart(self.customer, self.cart, payment_method="cash")
+
+        # Same stale cart instance: its lines are gone from the stored cart
+        with self.assertRaises(CheckoutError):
+            checkout_cart(self.customer, self.cart, payment_method="cash")
+        self.assertEqual(Order.objects.count(), len(self.stores))
+        for product in self.products:
+            product.refresh_from_db()
+            self.assertEqual(product.stock, 3)
+
+    def test_cart_is_restored_when_stock_step_fails(self):
+        with mock.patch("marketplace.checkout.decrement_stock", side_effect=CheckoutError("موجودی کافی نیست")):
+            response = self.checkout()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(sorted(self.cart_product_ids()), sorted(str(product.pk) for product in self.products))
+        self.assertFalse(Order.objects.exists())
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CustomerViewSet, StoreOwnerViewSet, ProductViewSet, CategoryViewSet, CartViewSet, OrderViewSet, WishlistViewSet, CommentViewSet
+from .views import CustomerViewSet, StoreOwnerViewSet, ProductViewSet, CategoryViewSet, HomeViewSet, CartViewSet, OrderViewSet, WishlistViewSet, CommentViewSet
 
 
 router = DefaultRouter()
@@ -8,6 +8,7 @@ router.register(r'users', CustomerViewSet, basename='customer')
 router.register(r'store-owners', StoreOwnerViewSet, basename='storeowner')
 router.register(r'products', ProductViewSet, basename='product')
 router.register(r'categories', CategoryViewSet, basename='category')
+router.register(r'home', HomeViewSet, basename='home')
 router.register(r'carts', CartViewSet, basename='cart')
 router.register(r'orders', OrderViewSet, basename='order')
 router.register(r'wishlists', WishlistViewSet, basename='wishlist')
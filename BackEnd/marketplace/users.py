@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Customer, StoreOwner
+
+
+# user_type -> concrete model holding that user's row
+USER_MODELS = {
+    'customer': Customer,
+    'store_owner': StoreOwner,
+}
+
+# Store owner rows carry counters updated with $inc outside save(), so only customers are
+# shared across requests
+SHARED_CACHE_MODELS = (Customer,)
+
+
+def get_user_cache():
+    return caches[getattr(settings, 'USER_CACHE_ALIAS', 'default')]
+
+
+def user_cache_key(model_name, user_id):
+    return 'user:%s:%s' % (model_name, user_id)
+
+
+def invalidate_user(user_id):
+    """Drop a user's cross-request cache entries; called whenever the profile is saved or deleted"""
+    get_user_cache().delete_many([
+        user_cache_key(model._meta.model_name, user_id) for model in SHARED_CACHE_MODELS
+    ])
+
+
+def resolve_user(request, model=None):
+    """
+    The authenticated user's Customer/StoreOwner row, or None for anonymous users and users
+    of another type. Loaded at most once per request (views and serializers share it through
+    the underlying HttpRequest); customers are also cached across requests for
+    USER_CACHE_TIMEOUT seconds (0 disables).
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return None
+    expected = USER_MODELS.get(getattr(user, 'user_type', None))
+    model = model or expected
+    if model is None or model is not expected:
+        return None
+    if isinstance(user, model):
+        return user
+
+    http_request = getattr(request, '_request', request)
+    resolved = http_request.__dict__.setdefault('_resolved_users', {})
+    if model in resolved:
+        return resolved[model]
+
+    timeout = getattr(settings, 'USER_CACHE_TIMEOUT', 0)
+    shared = bool(timeout) and model in SHARED_CACHE_MODELS
+    key = user_cache_key(model._meta.model_name, user.pk)
+    instance = get_user_cache().get(key) if shared else None
+    if instance is None:
+        instance = model.objects.filter(pk=user.pk).first()
+        if instance is not None and shared:
+            get_user_cache().set(key, instance, timeout)
+
+    resolved[model] = instance
+    return instance
@@ -2,12 +2,36 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.exceptions import PermissionDenied
+from rest_framework.generics import get_object_or_404
 from django.http import HttpResponse
-from django.db.models import Q
-from .models import Customer, StoreOwner, Product, ProductRating, Cart, Order, OrderItem, Wishlist, WishlistItem, Comment
-from .serializers import CartItemSerializer, CustomerSerializer, StoreOwnerSerializer, ProductSerializer, ProductRatingSerializer, CartSerializer, OrderSerializer, OrderItemSerializer, WishlistSerializer, WishlistItemSerializer, AddToWishlistSerializer, CommentSerializer
+from django.db.models import Q, prefetch_related_objects
+from datetime import timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from .models import Customer, StoreOwner, StoreRating, Product, ProductRating, ProductRanking, StoreSalesRollup, Cart, CartConflict, Order, OrderItem, Wishlist, WishlistItem, Comment
+from .serializers import CartItemSerializer, CustomerSerializer, StoreOwnerSerializer, ProductSerializer, ProductCardSerializer, ProductRatingSerializer, CartSerializer, OrderSerializer, OrderItemSerializer, WishlistSerializer, WishlistItemSerializer, AddToWishlistSerializer, CommentSerializer
 from .permissions import IsAdminRole, IsSelfOrAdmin, IsStoreOwner, IsStoreOwnerOrAdmin, IsCustomer, IsCustomerOrAdmin
-
+from .pagination import KeysetPagination, parse_page_params
+from .cache import CATALOG_SCOPE, STORES_SCOPE, cache_catalog_response, get_versions
+from .conditional import conditional_retrieve, first_or_none, weak_etag
+from .search import SearchUnavailable, search_product_ids
+from .facets import FacetFilterError, run_facet_query
+from .category_stores import STORE_SORTS, stores_by_category
+from .analytics import GRANULARITIES, store_analytics
+from .home import build_home
+from .rankings import RankingFilterError, parse_ranking_params, ranked_products
+from .normalization import normalize_phone, normalize_text
+from .users import resolve_user
+from .checkout import CheckoutError, checkout_cart
+
+
+def project_for_serializer(view, queryset):
+    """Load only the model fields behind the ?fields= / ?view= subset of the view's serializer"""
+    serializer_class = view.serializer_class
+    requested = serializer_class.get_requested_fields(view.request)
+    if requested is None:
+        return queryset
+    return queryset.only(*serializer_class.get_only_fields(requested))
 
 
 class CustomerViewSet(viewsets.ModelViewSet):
@@ -23,6 +47,8 @@ class CustomerViewSet(viewsets.ModelViewSet):
             if self.request.user.user_type != 'customer':
                 raise PermissionDenied("Not a customer")
             return self.request.user
+        # Accept phones typed with Persian/Arabic digits
+        self.kwargs[self.lookup_field] = normalize_phone(lookup_value)
         return super().get_object()
 
     def get_permissions(self):
@@ -82,6 +108,11 @@ class StoreOwnerViewSet(viewsets.ModelViewSet):
     queryset = StoreOwner.objects.all().order_by('-created_at')
     serializer_class = StoreOwnerSerializer
     lookup_field = 'phone'
+    # Fields hashed into the ETag; several are written without touching updated_at
+    conditional_fields = (
+        'updated_at', 'last_login', 'image', 'store_logo', 'seller_rating', 'store_rating',
+        'active_products_count', 'total_sales', 'total_revenue',
+    )
 
     def get_object(self):
         lookup_value = self.kwargs.get(self.lookup_field)
@@ -90,12 +121,22 @@ class StoreOwnerViewSet(viewsets.ModelViewSet):
                 raise PermissionDenied("Authentication required")
             if self.request.user.user_type != 'store_owner':
                 raise PermissionDenied("Not a store owner")
+            if StoreOwnerSerializer.get_requested_fields(self.request) is None:
+                # Full row: share the request's resolved store owner with the serializers
+                store_owner = resolve_user(self.request, StoreOwner)
+                if store_owner is None:
+                    raise PermissionDenied("Store owner not found")
+                return store_owner
             try:
-                return StoreOwner.objects.get(id=self.request.user.id)
+                return self.get_queryset().get(id=self.request.user.id)
             except StoreOwner.DoesNotExist:
                 raise PermissionDenied("Store owner not found")
+        # Accept phones typed with Persian/Arabic digits
+        self.kwargs[self.lookup_field] = normalize_phone(lookup_value)
         return super().get_object()
 
+    def get_queryset(self):
+        return project_for_serializer(self, super().get_queryset())
 
     def get_permissions(self):
 
@@ -111,13 +152,13 @@ class StoreOwnerViewSet(viewsets.ModelViewSet):
                           'upload_store_logo', 'remove_store_logo',
                           'profile_image_info', 'store_logo_info',
                           'download_profile_image', 'download_store_logo',
-                          'statistics']:
+                          'statistics', 'analytics']:
             # Store owner can manage their own data, admins can manage all
             return [IsSelfOrAdmin()]
-        if self.action in ['test_upload_store_logo']:
-            # Allow anyone for testing
+        if self.action in ['test_upload_store_logo', 'search']:
+            # Allow anyone for testing and store name lookup
             return [permissions.AllowAny()]
-        if self.action in ['rate-seller', 'rate-store']:
+        if self.action in ['rate_seller', 'rate_store']:
             # Only customers and admins can rate
             return [IsCustomerOrAdmin()]
         return [permissions.IsAuthenticated()]
@@ -128,6 +169,53 @@ class StoreOwnerViewSet(viewsets.ModelViewSet):
         self.perform_create(serializer)
         return Response({'detail': 'created successfully'}, status=status.HTTP_201_CREATED)
 
+    def get_conditional_validators(self, request, kwargs):
+        """Content-hash ETag for a store profile from a projection of its changing fields"""
+        lookup_value = kwargs.get(self.lookup_field)
+        if lookup_value == 'me':
+            if not request.user.is_authenticated:
+                return None
+            queryset = StoreOwner.objects.filter(id=request.user.id)
+        else:
+            queryset = self.get_queryset().filter(phone=normalize_phone(lookup_value))
+        store = first_or_none(queryset.only('id', *self.conditional_fields))
+        if store is None:
+            return None
+        self.check_object_permissions(request, store)
+        return weak_etag(str(store.pk), *(getattr(store, field) for field in self.conditional_fields)), None
+
+    @conditional_retrieve
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @action(detail=False, methods=['get'], url_path='search')
+    def search(self, request):
+        """Find approved stores whose normalized name starts with the query"""
+        query = normalize_text(request.query_params.get('q', ''))
+        if not query:
+            return Response(
+                {'detail': 'Search query (q) is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        stores = StoreOwner.objects.filter(
+            store_name_normalized__startswith=query,
+            seller_status='approved'
+        ).only('id', 'store_name', 'store_logo', 'store_rating').order_by('store_name_normalized')[:20]
+
+        return Response({
+            'query': request.query_params.get('q'),
+            'stores': [
+                {
+                    'id': str(store.id),
+                    'store_name': store.store_name,
+                    'store_logo': store.store_logo.url if store.store_logo else None,
+                    'store_rating': store.store_rating_summary,
+                }
+                for store in stores
+            ]
+        })
+
     # Profile Image Actions
 
     @action(detail=True, methods=['post'], url_path='upload-profile-image')
@@ -254,8 +342,61 @@ class StoreOwnerViewSet(viewsets.ModelViewSet):
             'active_products_count': store_owner.active_products_count,
             'total_sales': store_owner.total_sales,
             'total_revenue': str(store_owner.total_revenue),
-            'seller_rating': store_owner.seller_rating,
-            'store_rating': store_owner.store_rating,
+            'seller_rating': store_owner.seller_rating_summary,
+            'store_rating': store_owner.store_rating_summary,
+        })
+
+    @action(detail=True, methods=['get'], url_path='analytics')
+    def analytics(self, request, phone=None):
+        """Revenue and sales per day/week/month for a date range, merged from the daily rollups"""
+        store_owner = self.get_object()
+
+        granularity = request.query_params.get('granularity', 'day')
+        if granularity not in GRANULARITIES:
+            return Response(
+                {'detail': f'Invalid granularity. Valid values: {", ".join(GRANULARITIES)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Default to the last 30 days. parse_date returns None for malformed input and raises
+        # ValueError for well-formed but impossible dates: both are rejected before any arithmetic
+        def query_date(name):
+            value = request.query_params.get(name)
+            if not value:
+                return None
+            try:
+                parsed = parse_date(value)
+            except ValueError:
+                parsed = None
+            if parsed is None:
+                raise ValueError(name)
+            return parsed
+
+        try:
+            date_to = query_date('to') or timezone.now().date()
+            date_from = query_date('from') or date_to - timedelta(days=29)
+        except ValueError:
+            return Response(
+                {'detail': 'from and to must be dates (YYYY-MM-DD)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if date_from > date_to:
+            return Response(
+                {'detail': 'from must not be after to'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        data = store_analytics(
+            store_owner.pk,
+            StoreSalesRollup.day_bucket(date_from),
+            StoreSalesRollup.day_bucket(date_to),
+            granularity,
+        )
+        return Response({
+            'from': date_from.isoformat(),
+            'to': date_to.isoformat(),
+            'granularity': granularity,
+            **data,
         })
 
     # Rating Actions
@@ -273,7 +414,7 @@ class StoreOwnerViewSet(viewsets.ModelViewSet):
 
         try:
             rating = float(rating)
-            if rating < 0 or rating > 5:
+            if not 0 <= rating <= 5:
                 return Response(
                     {'detail': 'Rating must be between 0 and 5'},
                     status=status.HTTP_400_BAD_REQUEST
@@ -284,10 +425,11 @@ class StoreOwnerViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        store_owner.update_seller_rating(rating)
+        # One rating per user: rating again replaces the previous value
+        seller_rating = store_owner.rate(request.user, StoreRating.Kind.SELLER, rating)
         return Response({
             'detail': 'Seller rating updated successfully',
-            'seller_rating': store_owner.seller_rating
+            'seller_rating': seller_rating
         })
 
     @action(detail=True, methods=['post'], url_path='rate-store')
@@ -304,7 +446,7 @@ class StoreOwnerViewSet(viewsets.ModelViewSet):
         
         try:
             rating = float(rating)
-            if rating < 0 or rating > 5:
+            if not 0 <= rating <= 5:
                 return Response(
                     {'detail': 'Rating must be between 0 and 5'}, 
                     status=status.HTTP_400_BAD_REQUEST
@@ -315,10 +457,11 @@ class StoreOwnerViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        store_owner.update_store_rating(rating)
+        # One rating per user: rating again replaces the previous value
+        store_rating = store_owner.rate(request.user, StoreRating.Kind.STORE, rating)
         return Response({
             'detail': 'Store rating updated successfully',
-            'store_rating': store_owner.store_rating
+            'store_rating': store_rating
         })
 
 
@@ -326,6 +469,9 @@ class ProductViewSet(viewsets.ModelViewSet):
     """ViewSet for Product CRUD operations"""
     queryset = Product.objects.all().order_by('-created_at')
     serializer_class = ProductSerializer
+    pagination_class = KeysetPagination
+    # Listing actions that accept ?view=card
+    card_actions = ('list', 'my_products', 'store_products', 'search', 'facets')
 
     def get_queryset(self):
         """Filter products based on user type"""
@@ -346,12 +492,38 @@ class ProductViewSet(viewsets.ModelViewSet):
         # Apply ordering
         queryset = queryset.order_by('-created_at')
 
-        return queryset
+        return self.project_listing(queryset)
+
+    def is_card_view(self):
+        return (
+            self.request.method == 'GET'
+            and self.request.query_params.get('view') == 'card'
+            and self.action in self.card_actions
+        )
+
+    def get_serializer_class(self):
+        if self.is_card_view():
+            return ProductCardSerializer
+        return super().get_serializer_class()
+
+    def project_listing(self, queryset):
+        """Load only what the response reads: the card snapshot, the ?fields= subset, or everything"""
+        if self.is_card_view():
+            return queryset.only('id', 'card', 'created_at')
+        requested = ProductSerializer.get_requested_fields(self.request)
+        if requested is None:
+            return queryset.with_listing_relations()
+        # created_at is always loaded for the pagination cursor
+        only = ProductSerializer.get_only_fields(requested + ['created_at'])
+        return queryset.only(*only).with_listing_relations(
+            store_owner='store_owner' in requested,
+            images=bool({'images', 'images_count'} & set(requested)),
+        )
 
     def get_permissions(self):
         """Set permissions based on action"""
-        if self.action in ['list', 'retrieve']:
-            # Anyone can list/retrieve products, but filtered appropriately
+        if self.action in ['list', 'retrieve', 'search', 'facets', 'trending', 'best_sellers']:
+            # Anyone can list/retrieve/search products, but filtered appropriately
             return [permissions.AllowAny()]
         if self.action in ['create']:
             # Only store owners can create products
@@ -371,6 +543,27 @@ class ProductViewSet(viewsets.ModelViewSet):
             return [permissions.IsAuthenticated()]
         return [permissions.IsAuthenticated()]
 
+    @cache_catalog_response(lambda view, kwargs: [CATALOG_SCOPE], public_only=True)
+    def list(self, request, *args, **kwargs):
+        """List products; ?view=card reads only the denormalized card snapshot"""
+        return super().list(request, *args, **kwargs)
+
+    def get_conditional_validators(self, request, kwargs):
+        """ETag for product detail from an (id, updated_at, views) projection"""
+        queryset = self.get_queryset().prefetch_related(None).filter(pk=kwargs['pk'])
+        product = first_or_none(queryset.only('id', 'updated_at', 'views'))
+        if product is None:
+            return None
+        # Views and store renames change the detail without touching updated_at, so there is
+        # no Last-Modified: If-Modified-Since alone would answer 304 for a changed response
+        etag = weak_etag(str(product.pk), product.updated_at, product.views, get_versions([STORES_SCOPE]))
+        return etag, None
+
+    @conditional_retrieve
+    @cache_catalog_response(lambda view, kwargs: [('product', kwargs['pk']), STORES_SCOPE], public_only=True)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def create(self, request, *args, **kwargs):
         product_data = request.data
         product_images = request.FILES.getlist('images')
@@ -490,11 +683,10 @@ class ProductViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            customer = Customer.objects.get(id=user.id)
-            rating = ProductRating.objects.get(customer=customer, product=product)
+            rating = ProductRating.objects.get(customer_id=user.id, product=product)
             serializer = ProductRatingSerializer(rating, context={'request': request})
             return Response(serializer.data)
-        except (Customer.DoesNotExist, ProductRating.DoesNotExist):
+        except ProductRating.DoesNotExist:
             return Response(
                 {'detail': 'You have not rated this product yet'},
                 status=status.HTTP_404_NOT_FOUND
@@ -513,8 +705,7 @@ class ProductViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            customer = Customer.objects.get(id=user.id)
-            rating_obj = ProductRating.objects.get(customer=customer, product=product)
+            rating_obj = ProductRating.objects.get(customer_id=user.id, product=product)
 
             serializer = ProductRatingSerializer(
                 rating_obj,
@@ -534,7 +725,7 @@ class ProductViewSet(viewsets.ModelViewSet):
             else:
                 return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        except (Customer.DoesNotExist, ProductRating.DoesNotExist):
+        except ProductRating.DoesNotExist:
             return Response(
                 {'detail': 'You have not rated this product yet'},
                 status=status.HTTP_404_NOT_FOUND
@@ -544,11 +735,13 @@ class ProductViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'], url_path='view')
     def increment_views(self, request, pk=None):
         """Increment product view count"""
-        product = self.get_object()
-        product.increment_views()
+        # Only the id and the stored count are needed; the increment is buffered
+        queryset = self.get_queryset().prefetch_related(None).only('id', 'views')
+        product = get_object_or_404(queryset, pk=pk)
+        self.check_object_permissions(request, product)
         return Response({
             'detail': 'View count incremented',
-            'views': product.views
+            'views': product.increment_views()
         })
 
     # Bulk Actions
@@ -562,10 +755,95 @@ class ProductViewSet(viewsets.ModelViewSet):
             )
 
         queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'], url_path='search')
+    @cache_catalog_response(lambda view, kwargs: [CATALOG_SCOPE])
+    def search(self, request):
+        """Full-text search over active products ranked by relevance and popularity"""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {'detail': 'Search query (q) is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        category = request.query_params.get('category')
+        if category and category not in Product.Category.values:
+            return Response(
+                {'detail': f'Invalid category. Valid categories: {", ".join(Product.Category.values)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        page, page_size = parse_page_params(request)
+
+        # Fetch one extra id to know whether another page exists
+        try:
+            ids = search_product_ids(query, category=category, skip=(page - 1) * page_size, limit=page_size + 1)
+        except SearchUnavailable:
+            return Response(
+                {'detail': 'Product search is temporarily unavailable'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        has_next = len(ids) > page_size
+        ids = ids[:page_size]
+
+        products = {p.pk: p for p in self.project_listing(Product.objects.filter(id__in=ids))}
+        ranked = [products[pk] for pk in ids if pk in products]
+        serializer = self.get_serializer(ranked, many=True)
+        return Response({
+            'query': query,
+            'page': page,
+            'next_page': page + 1 if has_next else None,
+            'results': serializer.data,
+        })
+
+    @action(detail=False, methods=['get'], url_path='facets')
+    @cache_catalog_response(lambda view, kwargs: [CATALOG_SCOPE])
+    def facets(self, request):
+        """Filtered page of active products plus category/size/color/tag/price/stock counts in one aggregation"""
+        page, page_size = parse_page_params(request)
+
+        try:
+            ids, total, facets = run_facet_query(
+                request.query_params, skip=(page - 1) * page_size, limit=page_size
+            )
+        except FacetFilterError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        products = {p.pk: p for p in self.project_listing(Product.objects.filter(id__in=ids))}
+        serializer = self.get_serializer([products[pk] for pk in ids if pk in products], many=True)
+        return Response({
+            'total': total,
+            'page': page,
+            'next_page': page + 1 if page * page_size < total else None,
+            'results': serializer.data,
+            'facets': facets,
+        })
+
+    def ranking_response(self, request, kind):
+        try:
+            category, store_id, limit = parse_ranking_params(request.query_params)
+        except RankingFilterError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'results': ranked_products(kind, category=category, store_id=store_id, limit=limit),
+        })
+
+    @action(detail=False, methods=['get'], url_path='trending')
+    def trending(self, request):
+        """Active products ranked by views, sales and ratings decayed over time (?category= or ?store=)"""
+        return self.ranking_response(request, ProductRanking.Kind.TRENDING)
+
+    @action(detail=False, methods=['get'], url_path='best-sellers')
+    def best_sellers(self, request):
+        """Active products ranked by recent units sold (?category= or ?store=)"""
+        return self.ranking_response(request, ProductRanking.Kind.BEST_SELLERS)
 
     @action(detail=False, methods=['get'], url_path=r'store/(?P<store_owner_id>[^/]+)')
+    @cache_catalog_response(lambda view, kwargs: [('store', kwargs['store_owner_id'])])
     def store_products(self, request, store_owner_id=None):
         """Get active products of a specific store owner (accessible by customers)"""
         if not store_owner_id:
@@ -583,27 +861,29 @@ class ProductViewSet(viewsets.ModelViewSet):
             )
 
         # Get active products of this store owner
-        products = Product.objects.filter(
+        products = self.project_listing(Product.objects.filter(
             store_owner=store_owner,
             status='active'
-        ).order_by('-created_at')
+        ))
 
-        # Serialize products
-        serializer = self.get_serializer(products, many=True)
+        # Serialize one keyset page of products
+        page = self.paginate_queryset(products)
+        serializer = self.get_serializer(page, many=True)
         return Response({
             'store': {
                 'id': str(store_owner.id),
                 'store_name': store_owner.store_name,
-                'store_rating': store_owner.store_rating or {'average': 0, 'count': 0}
+                'store_rating': store_owner.store_rating_summary
             },
             'products': serializer.data,
-            'total_products': len(serializer.data)
+            'next': self.paginator.get_next_link()
         })
 
 class CommentViewSet(viewsets.ModelViewSet):
     """ViewSet for Comment operations"""
-    queryset = Comment.objects.all().order_by('-created_at')
+    queryset = Comment.objects.all().order_by('-created_at', '-id')
     serializer_class = CommentSerializer
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         """Filter comments - everyone can see comments, but filtered by product"""
@@ -618,7 +898,7 @@ class CommentViewSet(viewsets.ModelViewSet):
         # Replies are included in the 'replies' field of parent comments
         queryset = queryset.filter(parent__isnull=True)
 
-        return queryset.order_by('-created_at')
+        return queryset.order_by('-created_at', '-id')
 
     def get_permissions(self):
         """Set permissions based on action"""
@@ -689,13 +969,14 @@ class CommentViewSet(viewsets.ModelViewSet):
         comments = Comment.objects.filter(
             product_id=product_id,
             parent__isnull=True
-        ).order_by('-created_at')
+        )
 
-        serializer = self.get_serializer(comments, many=True)
+        page = self.paginate_queryset(comments)
+        serializer = self.get_serializer(page, many=True)
         return Response({
             'product_id': product_id,
             'comments': serializer.data,
-            'total_comments': len(serializer.data)
+            'next': self.paginator.get_next_link()
         })
 
     @action(detail=True, methods=['post'], url_path='reply')
@@ -759,10 +1040,9 @@ class WishlistViewSet(viewsets.GenericViewSet):
             if not hasattr(self.request.user, 'user_type') or self.request.user.user_type != 'customer':
                 raise PermissionDenied("Only customers can access their wishlist")
 
-            # Get the Customer instance
-            try:
-                customer = Customer.objects.get(id=self.request.user.id)
-            except Customer.DoesNotExist:
+            # Resolved once per request (and briefly cached across requests)
+            customer = resolve_user(self.request, Customer)
+            if customer is None:
                 raise PermissionDenied("Customer profile not found")
 
             # Get or create wishlist for the customer
@@ -844,57 +1124,56 @@ class CategoryViewSet(viewsets.ViewSet):
         return [permissions.AllowAny()]
 
     @action(detail=True, methods=['get'], url_path='stores')
+    @cache_catalog_response(lambda view, kwargs: [('category', kwargs['pk']), STORES_SCOPE])
     def stores_by_category(self, request, pk=None):
-        """Get stores that have products in the specified category"""
+        """Get approved stores with active products in the category, with per-store counts"""
         category = pk
 
         # Validate category
-        valid_categories = ['men', 'women', 'kids']
-        if category not in valid_categories:
+        if category not in Product.Category.values:
             return Response(
-                {'detail': f'Invalid category. Valid categories: {", ".join(valid_categories)}'},
+                {'detail': f'Invalid category. Valid categories: {", ".join(Product.Category.values)}'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Get stores that have active products in this category
-        stores = StoreOwner.objects.filter(
-            products__category=category,
-            products__status='active',
-            seller_status='approved'
-        ).distinct()
+        sort = request.query_params.get('sort', 'products')
+        if sort not in STORE_SORTS:
+            return Response(
+                {'detail': f'Invalid sort. Valid values: {", ".join(STORE_SORTS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        # Format response
-        store_list = []
-        for store in stores:
-            store_data = {
-                'id': str(store.id),
-                'store_name': store.store_name,
-                'store_rating': store.store_rating or {'average': 0, 'count': 0},
-                'store_logo': store.store_logo.url if store.store_logo else None,
-                'products_count': store.products.filter(
-                    category=category,
-                    status='active'
-                ).count()
-            }
-            store_list.append(store_data)
+        page, page_size = parse_page_params(request)
+
+        # One aggregation over the materialized category/store counts, joined to the stores
+        store_list, total = stores_by_category(
+            category, sort=sort, skip=(page - 1) * page_size, limit=page_size
+        )
 
         return Response({
             'category': category,
             'stores': store_list,
-            'total_stores': len(store_list)
+            'total_stores': total,
+            'page': page,
+            'next_page': page + 1 if page * page_size < total else None,
         })
 
     @action(detail=True, methods=['get'], url_path=r'stores/(?P<store_id>[^/]+)/products')
+    @cache_catalog_response(lambda view, kwargs: [('category', kwargs['pk']), ('store', kwargs['store_id'])])
     def products_by_store_category(self, request, pk=None, store_id=None):
-        """Get products of a specific store in the specified category"""
+        """
+        Get products of a specific store in the specified category. Unlike stores_by_category
+        this does not read the CategoryStore index: the product query on the (store_owner,
+        category) index answers an empty category just as cheaply, so checking the index first
+        would only add a round trip whenever the store does sell in the category.
+        """
         category = pk
         store_id = store_id
 
         # Validate category
-        valid_categories = ['men', 'women', 'kids']
-        if category not in valid_categories:
+        if category not in Product.Category.values:
             return Response(
-                {'detail': f'Invalid category. Valid categories: {", ".join(valid_categories)}'},
+                {'detail': f'Invalid category. Valid categories: {", ".join(Product.Category.values)}'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
@@ -907,12 +1186,12 @@ class CategoryViewSet(viewsets.ViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # Get products
+        # One query on the (store_owner, category) index; a category without products is an empty result
         products = Product.objects.filter(
             store_owner=store,
             category=category,
             status='active'
-        ).order_by('-created_at')
+        ).order_by('-created_at').with_listing_relations()
 
         # Serialize products
         serializer = ProductSerializer(products, many=True, context={'request': request})
@@ -922,13 +1201,25 @@ class CategoryViewSet(viewsets.ViewSet):
             'store': {
                 'id': str(store.id),
                 'store_name': store.store_name,
-                'store_rating': store.store_rating or {'average': 0, 'count': 0}
+                'store_rating': store.store_rating_summary
             },
             'products': serializer.data,
             'total_products': len(serializer.data)
         })
 
 
+class HomeViewSet(viewsets.ViewSet):
+    """Everything the home page needs in one response"""
+
+    def get_permissions(self):
+        """Allow anyone to access the home page"""
+        return [permissions.AllowAny()]
+
+    def list(self, request):
+        """Categories, top stores per category, latest and featured products; sections are built in parallel and cached separately"""
+        return Response(build_home())
+
+
 class CartViewSet(viewsets.ModelViewSet):
     """ViewSet for Cart operations"""
     queryset = Cart.objects.all().order_by('-created_at')
@@ -948,13 +1239,28 @@ class CartViewSet(viewsets.ModelViewSet):
             # Anonymous users or other types can't see carts
             return Cart.objects.none()
 
+    def get_conditional_validators(self, request, kwargs):
+        """ETag/Last-Modified for a cart from an (id, updated_at) projection"""
+        lookup_value = kwargs.get(self.lookup_field)
+        if lookup_value == 'me':
+            if getattr(request.user, 'user_type', None) != 'customer':
+                return None
+            queryset = self.get_queryset().filter(user_id=request.user.id)
+        else:
+            queryset = self.get_queryset().filter(pk=lookup_value)
+        cart = first_or_none(queryset.only('id', 'updated_at'))
+        if cart is None:
+            return None
+        self.check_object_permissions(request, cart)
+        return weak_etag(str(cart.pk), cart.updated_at), cart.updated_at
+
     def get_permissions(self):
         """Set permissions based on action"""
         if self.action in ['list', 'retrieve']:
             # Customers can view their own cart, admins can view all
             return [IsCustomerOrAdmin()]
         if self.action in ['create', 'update', 'partial_update', 'destroy',
-                          'add_item', 'update_item', 'remove_item', 'clear_cart']:
+                          'add_item', 'update_item', 'remove_item', 'clear_cart', 'refresh']:
             # Only customers can manage their own cart
             return [IsCustomer()]
         return [permissions.IsAuthenticated()]
@@ -968,10 +1274,9 @@ class CartViewSet(viewsets.ModelViewSet):
             if not hasattr(self.request.user, 'user_type') or self.request.user.user_type != 'customer':
                 raise PermissionDenied("Only customers can access their cart")
 
-            # Get the Customer instance
-            try:
-                customer = Customer.objects.get(id=self.request.user.id)
-            except Customer.DoesNotExist:
+            # Resolved once per request (and briefly cached across requests)
+            customer = resolve_user(self.request, Customer)
+            if customer is None:
                 raise PermissionDenied("Customer profile not found")
 
             # Get or create cart for the customer
@@ -980,6 +1285,10 @@ class CartViewSet(viewsets.ModelViewSet):
 
         return super().get_object()
 
+    @conditional_retrieve
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def create(self, request, *args, **kwargs):
         """Create a new cart - actually uses get_or_create"""
         serializer = self.get_serializer(data=request.data)
@@ -1006,29 +1315,21 @@ class CartViewSet(viewsets.ModelViewSet):
         if not item_serializer.is_valid():
             return Response(item_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        validated_item = item_serializer.validated_data
-
-        # Check if item already exists in cart
-        existing_item = None
-        for item in cart.items:
-            if item['product_id'] == validated_item['product_id']:
-                existing_item = item
-                break
-
-        if existing_item:
-            # Update quantity
-            existing_item['quantity'] += validated_item['quantity']
-            cart.save()
-            return Response({
-                'detail': 'Item quantity updated successfully',
-            })
-        else:
-            # Add new item
-            cart.items.append(validated_item)
-            cart.save()
+        # $push a new line, or positional $inc on the quantity of an existing one
+        try:
+            added = cart.add_item(dict(item_serializer.validated_data))
+        except CartConflict:
+            return Response(
+                {'detail': 'Cart was modified concurrently, please retry'},
+                status=status.HTTP_409_CONFLICT
+            )
+        if added:
             return Response({
                 'detail': 'Item added to cart successfully',
             })
+        return Response({
+            'detail': 'Item quantity updated successfully',
+        })
 
     @action(detail=True, methods=['put', 'patch'], url_path=r'update-item/(?P<product_id>[^/]+)')
     def update_item(self, request, pk=None, product_id=None):
@@ -1041,32 +1342,30 @@ class CartViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Find the item
-        item_found = False
-        for item in cart.items:
-            if item['product_id'] == product_id:
-                # Update item fields
-                if 'quantity' in request.data:
-                    item['quantity'] = request.data['quantity']
-                if 'color' in request.data:
-                    item['color'] = request.data['color']
-                if 'size' in request.data:
-                    item['size'] = request.data['size']
-                item_found = True
-                break
-
-        if not item_found:
+        line = next((item for item in cart.items if item.get('product_id') == product_id), None)
+        if line is None:
             return Response(
                 {'detail': 'Item not found in cart'},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # Validate updated item
-        item_serializer = CartItemSerializer(data=item)
+        # Only quantity, color and size can change; the merged line is validated in full so
+        # the product must still exist, be active and in stock
+        changes = {
+            field: request.data[field]
+            for field in ('quantity', 'color', 'size') if field in request.data
+        }
+        item_serializer = CartItemSerializer(data={**line, **changes})
         if not item_serializer.is_valid():
             return Response(item_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        cart.save()
+        item = cart.update_item(product_id, {field: item_serializer.validated_data[field] for field in changes})
+        if item is None:
+            return Response(
+                {'detail': 'Item not found in cart'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
         return Response({
             'detail': 'Item updated successfully',
             'item': item
@@ -1083,27 +1382,30 @@ class CartViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Find and remove the item
-        original_length = len(cart.items)
-        cart.items = [item for item in cart.items if item['product_id'] != product_id]
-
-        if len(cart.items) == original_length:
+        if not cart.remove_item(product_id):
             return Response(
                 {'detail': 'Item not found in cart'},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        cart.save()
         return Response({'detail': 'Item removed from cart successfully'})
 
     @action(detail=True, methods=['post'], url_path='clear')
     def clear_cart(self, request, pk=None):
         """Clear all items from the cart"""
         cart = self.get_object()
-        cart.items = []
-        cart.save()
+        cart.clear()
         return Response({'detail': 'Cart cleared successfully'})
 
+    @action(detail=True, methods=['get', 'post'], url_path='refresh')
+    def refresh(self, request, pk=None):
+        """
+        Check cart lines against current product price, status and stock.
+        GET reports the differences; POST also saves the current prices as the new snapshots.
+        """
+        cart = self.get_object()
+        return Response(cart.reprice(persist=request.method == 'POST'))
+
     # Additional Cart Actions
     @action(detail=True, methods=['get'], url_path='summary')
     def summary(self, request, pk=None):
@@ -1126,28 +1428,50 @@ class OrderViewSet(viewsets.ModelViewSet):
     """ViewSet for Order operations"""
     queryset = Order.objects.all().order_by('-created_at')
     serializer_class = OrderSerializer
+    pagination_class = KeysetPagination
+    # Listings leave out order items unless ?include=items
+    listing_actions = ('list', 'my_orders', 'store_orders')
+
+    def include_items(self):
+        if self.action not in self.listing_actions:
+            return True
+        if 'items' in self.request.query_params.get('include', '').split(','):
+            return True
+        return 'items' in (OrderSerializer.get_requested_fields(self.request) or [])
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['include_items'] = self.include_items()
+        return context
 
     def get_queryset(self):
         """Filter orders based on user type"""
         user = self.request.user
 
+        # Anonymous users can't see orders
+        queryset = Order.objects.none()
         if user.is_authenticated and hasattr(user, 'user_type'):
             if user.user_type == 'customer':
                 # Customers can only see their own orders
-                return Order.objects.filter(user=user)
+                queryset = Order.objects.filter(user=user)
             elif user.user_type == 'store_owner':
                 # Store owners can only see orders for their store
-                return Order.objects.filter(store=user)
+                queryset = Order.objects.filter(store=user)
             elif user.is_superuser:
                 # Admins can see all orders
-                return Order.objects.all()
+                queryset = Order.objects.all()
 
-        # Anonymous users can't see orders
-        return Order.objects.none()
+        fields = OrderSerializer.get_requested_fields(self.request) or OrderSerializer.Meta.fields
+        queryset = queryset.with_listing_relations(
+            user='user' in fields,
+            store='store' in fields,
+            items='items' in fields and self.include_items(),
+        )
+        return project_for_serializer(self, queryset)
 
     def get_permissions(self):
         """Set permissions based on action"""
-        if self.action in ['create']:
+        if self.action in ['create', 'checkout']:
             # Only customers can create orders
             return [IsCustomer()]
         if self.action in ['list', 'retrieve']:
@@ -1166,6 +1490,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         order = serializer.save()
+        prefetch_related_objects([order], *Order.listing_prefetches(user=False, items=True))
         serializer = self.get_serializer(order)
         return Response({
             'detail': 'Order created successfully',
@@ -1173,6 +1498,46 @@ class OrderViewSet(viewsets.ModelViewSet):
           
         }, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=['post'], url_path='checkout')
+    def checkout(self, request):
+        """
+        Check out the customer's cart in one request: one order per store, and the purchased
+        lines removed from the cart. Optional `product_ids` limits it to those lines.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        product_ids = request.data.get('product_ids')
+        if product_ids is not None and not isinstance(product_ids, list):
+            return Response(
+                {'detail': 'product_ids must be a list'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        customer = resolve_user(request, Customer)
+        cart = Cart.objects.filter(user_id=customer).first() if customer is not None else None
+        if cart is None:
+            return Response(
+                {'detail': 'Cart not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        try:
+            orders = checkout_cart(
+                customer,
+                cart,
+                product_ids=set(map(str, product_ids)) if product_ids is not None else None,
+                **serializer.validated_data,
+            )
+        except CheckoutError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        prefetch_related_objects(orders, *Order.listing_prefetches(user=False, items=True))
+        return Response({
+            'detail': 'Checkout completed successfully',
+            'data': self.get_serializer(orders, many=True).data,
+        }, status=status.HTTP_201_CREATED)
+
     # Additional Order Actions
     @action(detail=True, methods=['post'], url_path='update-status')
     def update_status(self, request, pk=None):
@@ -1258,8 +1623,9 @@ class OrderViewSet(viewsets.ModelViewSet):
             )
 
         queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     @action(detail=False, methods=['get'], url_path='store-orders')
     def store_orders(self, request):
@@ -1271,5 +1637,6 @@ class OrderViewSet(viewsets.ModelViewSet):
             )
 
         queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)